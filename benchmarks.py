@@ -0,0 +1,509 @@
+'''
+PrimeDiffEx benchmarks.
+
+Run with "python benchmarks.py". Every stage of a run is benchmarked on seeded datasets at several bit sizes:
+primality testing, prime generation, the SD/SR analysis, named prime sets, the CSV and state file writers,
+load_data and the rendering of animation frames. The results are written as JSON (to stdout, or to the file given
+with --output), one record per stage and dataset, so that runs on the same machine can be compared:
+
+    python benchmarks.py --output results.json
+    python benchmarks.py --bits 64 256 --num-primes 10000 --stage load_data --stage render_frame
+
+Each record has the best wall time over --repeat runs and the ops/sec it gives (ops are candidates tested, primes
+generated, rows analysed or written, or frames rendered), the peak RSS of the process that ran it, and the peak
+traced Python memory and the number of memory blocks left allocated by one run. Every record is measured in a
+fresh worker process, so that peak RSS belongs to that benchmark alone.
+
+"python benchmarks.py --compare" runs the checks that compare a fast path with the path it replaces.
+'''
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from fractions import Fraction
+
+import primediffex
+from primediffex import peak_rss_kib
+
+BENCHMARK_BITS = (10, 64, 256, 1024)
+BENCHMARK_NUM_PRIMES = (10000, 100000)
+MILLER_RABIN_ITERATIONS = 5
+
+# Primes generated by the generation benchmarks, by bit size. A 1024-bit prime takes most of a second to find, so
+# these datasets are much smaller than the synthetic ones used by the other stages.
+GENERATION_PRIMES = {10: 1000, 64: 1000, 256: 100, 1024: 5}
+DEFAULT_GENERATION_PRIMES = 100
+
+# Frames drawn by the rendering benchmark, and the named prime sets looked for.
+RENDER_FRAMES = 10
+PRIME_SETS = [2, 4, 6, 8, 10, 12]
+NUM_DIGITS = 10
+
+
+# A seeded, prime-like sequence: num_primes increasing odd numbers above a random num_bits start, separated by
+# even gaps drawn around the average prime gap at that size. Only the gaps matter to the SD/SR benchmarks, and
+# this avoids generating millions of real 1024-bit primes first.
+def synthetic_primes(num_bits, num_primes, seed=0):
+    rng = random.Random(seed)
+    mean_gap = max(2.0, num_bits * 0.6931)
+    prime = rng.getrandbits(num_bits) | (1 << (num_bits - 1)) | 1
+    primes = [prime]
+    for _ in range(num_primes - 1):
+        prime += 2 * max(1, round(rng.expovariate(2.0 / mean_gap)))
+        primes.append(prime)
+    return primes
+
+
+# Best wall time of repeat runs of function().
+def best_time(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# The number of primes the generation benchmarks find at num_bits.
+def generation_primes(num_bits):
+    return GENERATION_PRIMES.get(num_bits, DEFAULT_GENERATION_PRIMES)
+
+
+# Each benchmark takes a bit size, a number of primes and a scratch directory, prepares its input, and returns the
+# function to time and the number of ops one call performs. Generation benchmarks size themselves by bit size.
+
+def benchmark_miller_rabin(num_bits, num_primes, directory):
+    rng = random.Random(num_bits)
+    candidates = [rng.getrandbits(num_bits) | (1 << (num_bits - 1)) | 1
+                  for _ in range(10 * generation_primes(num_bits))]
+    witness_rng = random.Random(0)
+    return lambda: [primediffex.miller_rabin(n, MILLER_RABIN_ITERATIONS, witness_rng)
+                    for n in candidates], len(candidates)
+
+
+def benchmark_find_prime_sequence(num_bits, num_primes, directory):
+    count = generation_primes(num_bits)
+    start_number = random.Random(num_bits).getrandbits(num_bits) | (1 << (num_bits - 1))
+    return lambda: primediffex.find_prime_sequence(start_number, count, MILLER_RABIN_ITERATIONS, False,
+                                                   prime_engine="sieve", rng=random.Random(0)), count
+
+
+def benchmark_second_differences(num_bits, num_primes, directory):
+    primes = synthetic_primes(num_bits, num_primes)
+    return lambda: primediffex.calculate_second_differences(primes), num_primes
+
+
+def benchmark_second_ratios(num_bits, num_primes, directory):
+    primes = synthetic_primes(num_bits, num_primes)
+    return lambda: primediffex.calculate_second_ratios(primes), num_primes
+
+
+def benchmark_named_prime_sets(num_bits, num_primes, directory):
+    primes = synthetic_primes(num_bits, num_primes)
+    return lambda: primediffex.find_named_prime_sets(primes, PRIME_SETS, NUM_DIGITS), num_primes
+
+
+# The inputs of the writer benchmarks: the synthetic primes with their SDs, SRs, combinations and named sets.
+def _analysed_dataset(num_bits, num_primes):
+    primes = synthetic_primes(num_bits, num_primes)
+    second_differences = primediffex.calculate_second_differences(primes)
+    second_ratios = primediffex.calculate_second_ratios(primes)
+    combinations = Counter(zip(second_differences, second_ratios.strings()))
+    named_prime_sets = primediffex.find_named_prime_sets(primes, PRIME_SETS, NUM_DIGITS)
+    return primes, second_differences, second_ratios, combinations, named_prime_sets
+
+
+def benchmark_write_primes_csv(num_bits, num_primes, directory):
+    primes, second_differences, second_ratios, _, _ = _analysed_dataset(num_bits, num_primes)
+    base_filename = os.path.join(directory, "bench")
+    return lambda: primediffex.write_primes_to_csv(primes, second_differences, second_ratios, base_filename,
+                                                   NUM_DIGITS), num_primes
+
+
+def benchmark_write_primes_csv_gzip(num_bits, num_primes, directory):
+    primes, second_differences, second_ratios, _, _ = _analysed_dataset(num_bits, num_primes)
+    base_filename = os.path.join(directory, "bench")
+    return lambda: primediffex.write_primes_to_csv(primes, second_differences, second_ratios, base_filename,
+                                                   NUM_DIGITS, compression="gzip"), num_primes
+
+
+def benchmark_write_primes_parquet(num_bits, num_primes, directory):
+    primes, second_differences, second_ratios, _, _ = _analysed_dataset(num_bits, num_primes)
+    base_filename = os.path.join(directory, "bench")
+    return lambda: primediffex.write_primes_columnar(primes, second_differences, second_ratios, base_filename,
+                                                     NUM_DIGITS, "parquet"), num_primes
+
+
+def benchmark_write_sd_csv(num_bits, num_primes, directory):
+    _, second_differences, _, _, _ = _analysed_dataset(num_bits, num_primes)
+    base_filename = os.path.join(directory, "bench")
+    return lambda: primediffex.write_second_differences_to_csv(second_differences, base_filename), num_primes
+
+
+def benchmark_write_sr_csv(num_bits, num_primes, directory):
+    _, _, second_ratios, _, _ = _analysed_dataset(num_bits, num_primes)
+    base_filename = os.path.join(directory, "bench")
+    return lambda: primediffex.write_second_ratios_to_csv(second_ratios, base_filename), num_primes
+
+
+def benchmark_write_sd_sr_combinations_csv(num_bits, num_primes, directory):
+    _, _, _, combinations, _ = _analysed_dataset(num_bits, num_primes)
+    base_filename = os.path.join(directory, "bench")
+    return lambda: primediffex.write_sd_sr_combinations_to_csv(combinations, base_filename), num_primes
+
+
+def benchmark_write_named_prime_sets_csv(num_bits, num_primes, directory):
+    _, _, _, _, named_prime_sets = _analysed_dataset(num_bits, num_primes)
+    base_filename = os.path.join(directory, "bench")
+
+    def write():
+        primediffex.write_named_prime_sets_totals_to_csv(named_prime_sets, base_filename)
+        primediffex.write_named_prime_sets_to_csv(named_prime_sets, base_filename)
+    return write, num_primes
+
+
+def benchmark_write_state_pickle(num_bits, num_primes, directory):
+    primes, second_differences, second_ratios, _, _ = _analysed_dataset(num_bits, num_primes)
+    base_filename = os.path.join(directory, "bench")
+    return lambda: primediffex.write_state_to_pickle(primes, second_differences, second_ratios,
+                                                     base_filename), num_primes
+
+
+def benchmark_write_state_file(num_bits, num_primes, directory):
+    primes = synthetic_primes(num_bits, num_primes)
+    base_filename = os.path.join(directory, "bench")
+    return lambda: primediffex.write_state_file(primes, base_filename), num_primes
+
+
+# Write the files of a run over the synthetic primes into directory, as run_from_config does, and return the
+# arguments of load_data for them.
+def _write_run_files(num_bits, num_primes, directory):
+    primes, second_differences, second_ratios, _, _ = _analysed_dataset(num_bits, num_primes)
+    base_filename = os.path.join(directory, "bench")
+    primediffex.write_metadata_file(directory, primes[0], primes[-1], num_bits, num_primes, NUM_DIGITS)
+    primediffex.write_primes_to_csv(primes, second_differences, second_ratios, base_filename, NUM_DIGITS)
+    primediffex.write_second_differences_to_csv(second_differences, base_filename)
+    primediffex.write_second_ratios_to_csv(second_ratios, base_filename)
+    return (f"{base_filename}_primes.csv", f"{base_filename}_sd.csv", f"{base_filename}_sr.csv",
+            os.path.join(directory, "metadata.json"))
+
+
+def benchmark_load_data(num_bits, num_primes, directory):
+    filenames = _write_run_files(num_bits, num_primes, directory)
+    return lambda: primediffex.load_data(*filenames), num_primes
+
+
+def benchmark_render_frame(num_bits, num_primes, directory):
+    data, metadata, sd_freq, sr_freq, max_sd = primediffex.load_data(*_write_run_files(num_bits, num_primes, directory))
+    frames = primediffex.animation_frames(data, max_frames=RENDER_FRAMES)
+    renderer = primediffex.PrimeFrameRenderer(metadata, max_sd, len(sd_freq), len(sr_freq))
+    return lambda: [renderer.render(frame) for frame in frames], len(frames)
+
+
+def benchmark_render_charts(num_bits, num_primes, directory):
+    # render_dataset_charts takes the file prefix from the name of the output directory
+    directory = os.path.join(directory, "bench")
+    os.makedirs(directory, exist_ok=True)
+    _write_run_files(num_bits, num_primes, directory)
+    primes, _, _, combinations, _ = _analysed_dataset(num_bits, num_primes)
+    base_filename = os.path.join(directory, "bench")
+    primediffex.write_sd_sr_combinations_to_csv(combinations, base_filename)
+    primediffex.write_state_file(primes, base_filename)
+    return lambda: primediffex.render_dataset_charts(directory), num_primes
+
+
+BENCHMARKS = {
+    "miller_rabin": benchmark_miller_rabin,
+    "find_prime_sequence": benchmark_find_prime_sequence,
+    "second_differences": benchmark_second_differences,
+    "second_ratios": benchmark_second_ratios,
+    "named_prime_sets": benchmark_named_prime_sets,
+    "write_primes_csv": benchmark_write_primes_csv,
+    "write_primes_csv_gzip": benchmark_write_primes_csv_gzip,
+    "write_primes_parquet": benchmark_write_primes_parquet,
+    "write_sd_csv": benchmark_write_sd_csv,
+    "write_sr_csv": benchmark_write_sr_csv,
+    "write_sd_sr_combinations_csv": benchmark_write_sd_sr_combinations_csv,
+    "write_named_prime_sets_csv": benchmark_write_named_prime_sets_csv,
+    "write_state_pickle": benchmark_write_state_pickle,
+    "write_state_file": benchmark_write_state_file,
+    "load_data": benchmark_load_data,
+    "render_frame": benchmark_render_frame,
+    "render_charts": benchmark_render_charts,
+}
+
+# Parquet output needs pyarrow
+if primediffex.optional_module("pyarrow") is None:
+    del BENCHMARKS["write_primes_parquet"]
+
+# Stages whose dataset size is set by the bit size alone (GENERATION_PRIMES), not by --num-primes.
+GENERATION_BENCHMARKS = {"miller_rabin", "find_prime_sequence"}
+
+
+# Run one benchmark and return its record: timings from repeat untraced runs, then one run under tracemalloc for
+# the peak traced memory and the net change in allocated memory blocks while the result is alive (blocks allocated
+# and not yet freed, which is not the number of allocations made). Progress output is discarded.
+def run_benchmark(name, num_bits, num_primes, repeat, arithmetic_backend="python"):
+    arithmetic_backend = primediffex.use_arithmetic_backend(arithmetic_backend)
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        function, ops = BENCHMARKS[name](num_bits, num_primes, directory)
+        function()  # Warm up caches (small primes, fonts) before timing
+        best = best_time(function, repeat)
+
+        blocks_before = sys.getallocatedblocks()
+        tracemalloc.start()
+        result = function()
+        _, peak_traced = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        net_allocated_blocks = sys.getallocatedblocks() - blocks_before
+        del result
+        peak_rss = peak_rss_kib()
+
+    return {
+        "benchmark": name,
+        "num_bits": num_bits,
+        "num_primes": generation_primes(num_bits) if name in GENERATION_BENCHMARKS else num_primes,
+        "ops": ops,
+        "repeat": repeat,
+        "arithmetic_backend": arithmetic_backend,
+        "best_seconds": best,
+        "ops_per_sec": ops / best if best > 0 else None,
+        "peak_rss_kib": peak_rss,
+        "peak_traced_bytes": peak_traced,
+        "net_allocated_blocks": net_allocated_blocks,
+    }
+
+
+# Run one benchmark in a fresh worker process, so its peak RSS is not inflated by the benchmarks before it.
+def run_isolated(name, num_bits, num_primes, repeat, arithmetic_backend="python"):
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(run_benchmark, name, num_bits, num_primes, repeat, arithmetic_backend).result()
+
+
+# Run the selected benchmarks over every bit size (and, for the non-generation stages, every number of primes).
+def run_benchmarks(names, bits, num_primes_list, repeat, isolate=True, verbose=True, arithmetic_backend="python"):
+    run = run_isolated if isolate else run_benchmark
+    results = []
+    for name in names:
+        for num_bits in bits:
+            for num_primes in ([None] if name in GENERATION_BENCHMARKS else num_primes_list):
+                record = run(name, num_bits, num_primes, repeat, arithmetic_backend)
+                if verbose:
+                    print(f"{name:<30} {num_bits:>5} bits {record['num_primes']:>8} primes "
+                          f"{record['ops_per_sec']:>14.1f} ops/s", file=sys.stderr)
+                results.append(record)
+    return results
+
+
+# A description of the machine and interpreter, stored with the results so runs can be matched up.
+def environment():
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+# The second ratio computation as it was: a Fraction with limit_denominator() per element, counted and formatted
+# through the Fractions.
+def _second_ratios_with_fractions(primes):
+    gaps = [b - a for a, b in zip(primes[:-1], primes[1:])]
+    second_ratios = [Fraction(b - a, b + a).limit_denominator() for a, b in zip(gaps[:-1], gaps[1:])]
+    return Counter(second_ratios), [str(sr) for sr in second_ratios]
+
+
+# The reduced-ratio arrays: gcd-normalised (numerator, denominator) integers, counted and formatted on the arrays.
+def _second_ratios_with_arrays(primes):
+    second_ratios = primediffex.calculate_second_ratios(primes)
+    return second_ratios.counts(), list(second_ratios.strings())
+
+
+# Compare Fraction.limit_denominator() against the reduced-ratio arrays, including counting and the strings
+# written to _primes.csv and _sr.csv, which must be identical.
+def compare_second_ratios(num_bits=1024, num_primes=200000, repeat=3):
+    primes = synthetic_primes(num_bits, num_primes)
+    old_counter, old_strings = _second_ratios_with_fractions(primes)
+    new_counter, new_strings = _second_ratios_with_arrays(primes)
+    assert old_strings == new_strings, "second ratio strings differ"
+    assert [(str(sr), count) for sr, count in old_counter.most_common()] == \
+        [(str(sr), count) for sr, count in new_counter.most_common()], "second ratio counts differ"
+
+    fraction_time = best_time(lambda: _second_ratios_with_fractions(primes), repeat)
+    array_time = best_time(lambda: _second_ratios_with_arrays(primes), repeat)
+    print(f"Second ratios, {num_bits}-bit, {num_primes} primes:")
+    print(f"  Fraction.limit_denominator: {fraction_time:.3f} s")
+    print(f"  reduced ratio arrays:       {array_time:.3f} s")
+    print(f"  speedup:                    {fraction_time / array_time:.1f}x")
+    return {"fraction_seconds": fraction_time, "array_seconds": array_time}
+
+
+# Generate the same seeded prime sequences with the python and gmpy2 arithmetic backends, for each primality test,
+# and check that they are identical: same primes, and the same witnesses drawn, so the same search counters.
+def compare_arithmetic_backends(num_bits=1024, num_primes=5, seed=2024, repeat=1):
+    if primediffex.optional_module("gmpy2") is None:
+        print("Arithmetic backends: skipped, gmpy2 is not installed")
+        return None
+    start_number = random.Random(seed).getrandbits(num_bits) | (1 << (num_bits - 1))
+    times = {}
+    print(f"Arithmetic backends, {num_bits}-bit, {num_primes} primes:")
+    for primality_test in ("miller_rabin", "bpsw"):
+        sequences = {}
+        for backend in ("python", "gmpy2"):
+            primediffex.use_arithmetic_backend(backend)
+
+            def search():
+                stats = primediffex.SearchStats()
+                primes = primediffex.find_prime_sequence(start_number, num_primes, MILLER_RABIN_ITERATIONS, False,
+                                                         prime_engine="sieve", primality_test=primality_test,
+                                                         rng=random.Random(seed), stats=stats)
+                return primes, stats.as_dict()
+
+            sequences[backend] = search()
+            times[primality_test, backend] = best_time(search, repeat)
+        primediffex.use_arithmetic_backend("python")
+        assert sequences["python"] == sequences["gmpy2"], f"{primality_test}: the backends found different primes"
+        python_time, gmpy2_time = times[primality_test, "python"], times[primality_test, "gmpy2"]
+        print(f"  {primality_test + ':':<14}python {python_time:.3f} s, gmpy2 {gmpy2_time:.3f} s "
+              f"({python_time / gmpy2_time:.1f}x), identical sequences")
+    return times
+
+
+# Run a seeded config in memory and with low_memory, each in its own temporary directory, and return both results.
+def _run_in_memory_and_low_memory(config):
+    results = []
+    for low_memory in (False, True):
+        with tempfile.TemporaryDirectory() as directory:
+            config_file = os.path.join(directory, "config.json")
+            with open(config_file, "w") as file:
+                json.dump(dict(config, low_memory=low_memory), file)
+            working_directory = os.getcwd()
+            os.chdir(directory)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = primediffex.run_from_config(config_file)
+                    # A StoredDataset reads its outputs on demand, so read them before the directory is removed
+                    primes, sd, sr, sd_sr_combinations, totals = result
+                    results.append((list(primes), list(sd), list(sr), sd_sr_combinations, totals))
+            finally:
+                os.chdir(working_directory)
+    return results
+
+
+# Check that a low_memory run unpacks like the in-memory result of the same config, with every output written and
+# with the SD-SR combinations and named prime set totals outputs turned off, which then read back as None.
+def compare_low_memory(num_bits=64, num_primes=2000, seed=2024):
+    config = {"random_seed": seed, "num_bits": num_bits, "num_primes": num_primes, "start_number": "random",
+              "write_output": True, "num_digits": "auto", "miller_rabin_iterations": MILLER_RABIN_ITERATIONS}
+    in_memory, low_memory = _run_in_memory_and_low_memory(config)
+    assert in_memory[:3] == low_memory[:3], "low_memory gives different sequences"
+    assert in_memory[3] == low_memory[3], "low_memory gives different SD-SR combinations"
+    totals = {name: primediffex.named_set_total(matches) for name, matches in in_memory[4].items()}
+    assert low_memory[4] == totals, "low_memory gives different named prime set totals"
+
+    config.update(output_sd_sr_combinations=False, output_named_prime_sets_totals=False)
+    in_memory, low_memory = _run_in_memory_and_low_memory(config)
+    assert in_memory[:3] == low_memory[:3], "low_memory gives different sequences"
+    assert low_memory[3] is None and low_memory[4] is None, "outputs that were not written should read as None"
+
+    # The same three ways through run_sweep, whose summaries take the SD and SR counts and the named prime set
+    # totals from the run's result
+    runs = [{"low_memory": False}, {"low_memory": True},
+            {"low_memory": True, "output_sd_sr_combinations": False, "output_named_prime_sets_totals": False}]
+    with tempfile.TemporaryDirectory() as directory:
+        sweep_file = os.path.join(directory, "sweep.json")
+        with open(sweep_file, "w") as file:
+            json.dump({"base": dict(config, output_sd_sr_combinations=True, output_named_prime_sets_totals=True),
+                       "runs": runs, "output_directory": os.path.join(directory, "sweep")}, file)
+        with contextlib.redirect_stdout(io.StringIO()):
+            summaries = primediffex.run_sweep(sweep_file, num_workers=1)
+    assert not any("error" in summary for summary in summaries), [summary.get("error") for summary in summaries]
+    in_memory, low_memory, without_outputs = summaries
+    for summary in (low_memory, without_outputs):
+        assert summary["sd_counts"] == in_memory["sd_counts"], "the sweep gives different SD counts with low_memory"
+        assert summary["sr_counts"] == in_memory["sr_counts"], "the sweep gives different SR counts with low_memory"
+    assert low_memory["named_prime_sets_totals"] == in_memory["named_prime_sets_totals"], \
+        "the sweep gives different named prime set totals with low_memory"
+    assert without_outputs["named_prime_sets_totals"] == {}, "totals that were not written should be empty"
+    print(f"low_memory, {num_bits}-bit, {num_primes} primes: unpacks like the in-memory result, and sweeps alike, "
+          f"with and without the SD-SR combinations and totals outputs")
+
+
+# Time importing the package in a fresh interpreter, as a generation worker does, against importing it together with
+# the visualization layer, and check that the first leaves matplotlib, pandas, tqdm and NumPy unimported.
+def compare_import_time(repeat=5):
+    package_directory = os.path.dirname(os.path.abspath(__file__))
+    imports = {
+        "core": "import primediffex",
+        "core and visualization": "import primediffex.visualization",
+    }
+    heavy_modules = ("matplotlib", "pandas", "tqdm", "numpy", "sympy")
+    interpreter_time = best_time(lambda: subprocess.run([sys.executable, "-c", "pass"], check=True), repeat)
+    times = {}
+    print(f"Import time (interpreter startup of {interpreter_time * 1000:.0f} ms excluded):")
+    for name, statement in imports.items():
+        code = f"{statement}; import sys; print(' '.join(m for m in {heavy_modules!r} if m in sys.modules))"
+        command = [sys.executable, "-c", code]
+        loaded = subprocess.run(command, check=True, capture_output=True, text=True, cwd=package_directory).stdout
+        times[name] = best_time(lambda: subprocess.run(command, check=True, capture_output=True,
+                                                       cwd=package_directory), repeat) - interpreter_time
+        print(f"  {name + ':':<24}{times[name] * 1000:>6.0f} ms  loads: {loaded.strip() or '(none)'}")
+        if name == "core":
+            assert not loaded.strip(), f"importing primediffex loads {loaded.strip()}"
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the stages of a PrimeDiffEx run.")
+    parser.add_argument("--bits", type=int, nargs="+", default=list(BENCHMARK_BITS),
+                        help="bit sizes of the datasets (default: %(default)s)")
+    parser.add_argument("--num-primes", type=int, nargs="+", default=list(BENCHMARK_NUM_PRIMES),
+                        help="primes per dataset for the analysis, writer and loader stages (default: %(default)s)")
+    parser.add_argument("--stage", action="append", choices=sorted(BENCHMARKS),
+                        help="benchmark only this stage; may be repeated (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark (default: %(default)s)")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    parser.add_argument("--no-isolate", action="store_true",
+                        help="run every benchmark in this process (faster, but peak RSS is cumulative)")
+    parser.add_argument("--arithmetic-backend", choices=["python", "gmpy2", "auto"], default="python",
+                        help="arithmetic backend of the primality tests (default: %(default)s)")
+    parser.add_argument("--compare", action="store_true",
+                        help="run the fast-path equivalence checks instead of the benchmarks")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare_second_ratios()
+        compare_import_time()
+        compare_arithmetic_backends()
+        compare_low_memory()
+        return
+
+    names = [name for name in BENCHMARKS if not args.stage or name in args.stage]
+    results = {
+        "environment": environment(),
+        "benchmarks": run_benchmarks(names, args.bits, args.num_primes, args.repeat, isolate=not args.no_isolate,
+                                     arithmetic_backend=args.arithmetic_backend),
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
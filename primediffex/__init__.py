@@ -0,0 +1,37 @@
+'''
+PrimeDiffEx Prime Difference Explorer.
+
+The generation and analysis core (primediffex.core) needs only the standard library, and NumPy, zstandard or pyarrow
+for the options that use them, so headless runs and their worker processes start quickly. The animation and
+visualization functions (primediffex.visualization) need matplotlib, pandas and tqdm; they are imported the first
+time one of them is used, e.g. primediffex.run_config_animation, and so are the static charts
+(primediffex.charts), e.g. primediffex.render_dataset_charts. "python -m primediffex" is the command line.
+'''
+from .core import *
+from .core import __all__
+
+# Names of the layers that need matplotlib, each imported from its module on first use
+LAZY_NAMES = {
+    **dict.fromkeys((
+        "PrimeFrameRenderer", "animation_frames", "create_prime_animation", "create_prime_frame_for_animation",
+        "create_ranked_data", "dataset_title", "load_data", "parse_ratio", "ratio_decimals", "read_primes_data",
+        "read_state_data", "run_config_animation", "truncated_prime_strings", "write_frames_with_ffmpeg",
+    ), "visualization"),
+    **dict.fromkeys((
+        "binned_second_differences", "plot_sd_distribution", "plot_sd_sr_heatmap", "plot_sd_time_series",
+        "plot_sr_distribution", "render_dataset_charts", "rolling_bin_statistics", "sd_histogram",
+        "sd_sr_heatmap", "second_difference_chunks", "sr_histogram",
+    ), "charts"),
+}
+
+
+def __getattr__(name):
+    if name in LAZY_NAMES:
+        from importlib import import_module
+        module = import_module(f".{LAZY_NAMES[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(LAZY_NAMES))
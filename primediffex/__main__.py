@@ -0,0 +1,70 @@
+'''
+PrimeDiffEx command line.
+
+    python -m primediffex run config.json
+    python -m primediffex run config.json --log
+    python -m primediffex animate 64bit1000_20240101_120000 --workers 4 --fps 10
+    python -m primediffex sweep sweep.json --workers 8
+    python -m primediffex charts 64bit1000_20240101_120000 --bins 2000
+
+"run" is run_from_config (so a config with resume_from or extend_from resumes or extends a dataset), "animate" is
+run_config_animation on an output directory, "sweep" is run_sweep, and "charts" is render_dataset_charts on an
+output directory. Only "animate" and "charts" import matplotlib.
+'''
+import argparse
+import logging
+import os
+
+from .core import run_from_config, run_sweep
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m primediffex", description="PrimeDiffEx Prime Difference Explorer.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="generate and analyse the primes of a config file")
+    run_parser.add_argument("config_file")
+    run_parser.add_argument("--log", action="store_true",
+                            help="log the progress and stage events as JSON lines on stderr")
+
+    animate_parser = commands.add_parser("animate", help="animate the dataset in an output directory")
+    animate_parser.add_argument("directory")
+    animate_parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                                help="frame rendering processes (default: one per CPU, %(default)s)")
+    animate_parser.add_argument("--frame-step", type=int, default=1,
+                                help="draw every this many primes (default: %(default)s)")
+    animate_parser.add_argument("--max-frames", type=int, help="draw at most this many frames")
+    animate_parser.add_argument("--fps", type=int, default=5, help="frames per second (default: %(default)s)")
+
+    sweep_parser = commands.add_parser("sweep", help="run every config of a sweep file")
+    sweep_parser.add_argument("sweep_file")
+    sweep_parser.add_argument("--workers", type=int, help="runs at a time (default: the sweep's num_workers)")
+
+    charts_parser = commands.add_parser("charts", help="render the static charts of the dataset in an output directory")
+    charts_parser.add_argument("directory")
+    charts_parser.add_argument("--bins", type=int, default=2000,
+                               help="bins of the second difference time series (default: %(default)s)")
+    charts_parser.add_argument("--window", type=int,
+                               help="second differences in the time series' rolling window (default: ten bins)")
+    charts_parser.add_argument("--dpi", type=int, default=100, help="resolution of the PNGs (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        callback = None
+        if args.log:
+            logging.basicConfig(level=logging.INFO, format="%(message)s")
+            callback = logging.getLogger("primediffex")
+        run_from_config(args.config_file, callback)
+    elif args.command == "animate":
+        from .visualization import run_config_animation
+        run_config_animation(args.directory, args.workers, args.frame_step, args.max_frames, args.fps)
+    elif args.command == "charts":
+        from .charts import render_dataset_charts
+        for filename in render_dataset_charts(args.directory, args.bins, args.window, dpi=args.dpi):
+            print(filename)
+    else:
+        run_sweep(args.sweep_file, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+'''
+Static Charts
+
+Precomputed charts of a finished dataset, drawn from its outputs rather than from the per-prime table: the second
+difference and second ratio distributions from the _sd and _sr counts, a second difference by second ratio heatmap
+from the SD-SR combinations, and a binned time series of the second differences. The distributions and the heatmap
+take time in the number of distinct values, not primes. The time series streams the compact state file (or the
+primes table) once in chunks, and draws one point per bin, so its figure is the same size for any number of primes.
+
+Figures are drawn with matplotlib.figure.Figure, without pyplot, so rendering needs no display and keeps no global
+figure state. Loaded the first time one of them is used from the primediffex package, like the visualization layer.
+'''
+
+import csv
+import json
+import os
+from fractions import Fraction
+from itertools import islice
+from operator import itemgetter
+import numpy as np
+from matplotlib.collections import PolyCollection
+from matplotlib.colors import LogNorm
+from matplotlib.figure import Figure
+
+from .core import (CSV_OUTPUT_SUFFIXES, OUTPUT_BATCH_ROWS, find_output_file, load_state_file, open_input_file,
+                   optional_module, read_counts_csv)
+
+# Formats of the primes table that second_difference_chunks reads, in the order they are looked for
+PRIMES_TABLE_SUFFIXES = CSV_OUTPUT_SUFFIXES + (".parquet", ".arrow")
+
+# Second differences read at a time for the time series
+SECOND_DIFFERENCE_CHUNK = OUTPUT_BATCH_ROWS * 16
+
+# Per-bin statistics of binned_second_differences
+BIN_STATISTICS = ("count", "sum", "abs_sum", "square_sum", "min", "max")
+
+SIGN_COLORS = {"Positive": "g", "Negative": "r", "Zero": "b"}
+SIGNS = {"Positive": 1, "Negative": -1, "Zero": 0}
+
+
+def chart_title(name, metadata):
+    """A chart title naming the dataset it was drawn from."""
+    return f"{name}\n{metadata['num_primes']} primes of {metadata['num_bits']} bits"
+
+
+def ratio_value(ratio):
+    """The float value of a second ratio, given as a Fraction or as a ratio string ('3/2', '-1', '0'), or None for
+    no ratio. Strings are split rather than parsed by Fraction, which is several times slower."""
+    if ratio is None or ratio in ("", "None"):
+        return None
+    if isinstance(ratio, Fraction):
+        return float(ratio)
+    numerator, _, denominator = ratio.partition("/")
+    return int(numerator) / int(denominator or 1)
+
+
+def add_bars(ax, x, heights, width, color, label):
+    """Draw bars of the given width centered on x as a single PolyCollection: with thousands of distinct values,
+    ax.bar, which adds a patch per bar, takes most of the rendering time."""
+    left, right = x - width / 2, x + width / 2
+    zeros = np.zeros_like(heights)
+    vertices = np.stack([np.column_stack(corner) for corner in
+                         ((left, zeros), (left, heights), (right, heights), (right, zeros))], axis=1)
+    ax.add_collection(PolyCollection(vertices, facecolors=color, edgecolors="none", label=label))
+    ax.autoscale_view()
+
+
+def sd_histogram(sd_counts):
+    """Sorted arrays of the distinct second differences and their counts, from a Counter of second differences
+    (as written to the _sd output)."""
+    values = np.array(sorted(sd_counts), dtype=np.int64)
+    counts = np.array([sd_counts[value] for value in values.tolist()], dtype=np.int64)
+    return values, counts
+
+
+def plot_sd_distribution(sd_counts, output_filename, metadata, num_labels=11, figsize=(16, 9), dpi=100):
+    """Draw the second difference distribution as one bar per distinct value, colored by sign, labelling the
+    num_labels most common values, and save it to output_filename."""
+    values, counts = sd_histogram(sd_counts)
+    fig = Figure(figsize=figsize, dpi=dpi)
+    ax = fig.subplots()
+    width = 0.8 * (np.diff(values).min() if len(values) > 1 else 1)
+    for name, color in SIGN_COLORS.items():
+        mask = np.sign(values) == SIGNS[name]
+        if mask.any():
+            add_bars(ax, values[mask], counts[mask], width, color, name)
+    ax.set_ylim(bottom=0)
+    for index in np.argsort(counts, kind="stable")[::-1][:num_labels]:
+        ax.annotate(f"{values[index]}", (values[index], counts[index]), textcoords="offset points",
+                    xytext=(0, 5), ha="center", fontsize=8,
+                    bbox=dict(boxstyle="round,pad=0.3", fc="yellow", alpha=0.5))
+    ax.set_xlabel("Second Difference")
+    ax.set_ylabel("Count")
+    ax.set_title(chart_title("Distribution of Second Differences", metadata))
+    ax.legend()
+    fig.savefig(output_filename)
+    return output_filename
+
+
+def sr_histogram(sr_counts, bins=50):
+    """Histogram of a Counter of second ratios (ratio strings as in the _sr output, or Fractions) over bins
+    equal-width bins spanning the ratios that occur, weighted by their counts.
+
+    Returns the bin edges, a dict of the per-bin counts of the positive, negative and zero ratios, and for each bin
+    its most common ratio string (or None for an empty bin). Missing ratios are left out.
+    """
+    ratios = [(ratio, value, count) for ratio, value, count in
+              ((ratio, ratio_value(ratio), count) for ratio, count in sr_counts.items()) if value is not None]
+    if not ratios:
+        return np.linspace(-1, 1, bins + 1), {name: np.zeros(bins, dtype=np.int64) for name in SIGN_COLORS}, \
+            [None] * bins
+    values = np.array([value for _, value, _ in ratios])
+    weights = np.array([count for _, _, count in ratios], dtype=np.int64)
+    low, high = values.min(), values.max()
+    edges = np.linspace(low, high, bins + 1) if high > low else np.linspace(low - 0.5, high + 0.5, bins + 1)
+    indices = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, bins - 1)
+    counts = {}
+    for name in SIGN_COLORS:
+        mask = np.sign(values) == SIGNS[name]
+        counts[name] = np.bincount(indices[mask], weights=weights[mask], minlength=bins).astype(np.int64)
+    modes = [None] * bins
+    mode_counts = [0] * bins
+    for (ratio, _, count), index in zip(ratios, indices.tolist()):
+        if count > mode_counts[index]:
+            modes[index], mode_counts[index] = ratio, count
+    return edges, counts, modes
+
+
+def plot_sr_distribution(sr_counts, output_filename, metadata, bins=50, num_labels=20, figsize=(16, 9), dpi=100):
+    """Draw the second ratio distribution as a histogram of bins bins, with the positive, negative and zero ratios
+    colored apart, labelling the num_labels tallest bins with their most common ratio, and save it to
+    output_filename."""
+    edges, counts, modes = sr_histogram(sr_counts, bins)
+    fig = Figure(figsize=figsize, dpi=dpi)
+    ax = fig.subplots()
+    bottom = np.zeros(bins, dtype=np.int64)
+    for name, color in SIGN_COLORS.items():
+        if counts[name].any():
+            ax.bar(edges[:-1], counts[name], width=np.diff(edges), bottom=bottom, align="edge", color=color,
+                   alpha=0.7, label=name)
+            bottom += counts[name]
+    for index in np.argsort(bottom, kind="stable")[::-1][:num_labels]:
+        if bottom[index]:
+            ax.annotate(str(modes[index]), ((edges[index] + edges[index + 1]) / 2, bottom[index]),
+                        textcoords="offset points", xytext=(0, 5), ha="center", fontsize=8,
+                        bbox=dict(boxstyle="round,pad=0.3", fc="yellow", alpha=0.5))
+    ax.set_xlabel("Second Ratio")
+    ax.set_ylabel("Count")
+    ax.set_title(chart_title("Distribution of Second Ratios", metadata))
+    ax.legend()
+    fig.savefig(output_filename)
+    return output_filename
+
+
+def sd_sr_heatmap(sd_sr_combinations, sd_bins=100, sr_bins=100):
+    """Two-dimensional histogram of (second difference, second ratio) counts, from the Counter of
+    calculate_sd_sr_combinations (Fraction ratios) or the _sd_sr_combinations output (ratio strings).
+
+    The second ratio axis spans [-1, 1], the whole range of (g2 - g1) / (g2 + g1) for positive gaps, in sr_bins
+    bins. The second difference axis has one bin per even value when there are at most sd_bins of them, and
+    sd_bins equal-width bins otherwise. Returns the counts (second differences along the first axis) and the
+    edges of both axes. Pairs without a ratio are left out.
+    """
+    pairs = [(sd, value, count) for sd, value, count in
+             ((sd, ratio_value(sr), count) for (sd, sr), count in sd_sr_combinations.items()) if value is not None]
+    sr_edges = np.linspace(-1, 1, sr_bins + 1)
+    if not pairs:
+        return np.zeros((sd_bins, sr_bins), dtype=np.int64), np.linspace(-1, 1, sd_bins + 1), sr_edges
+    sd = np.array([pair[0] for pair in pairs], dtype=np.int64)
+    sr = np.array([pair[1] for pair in pairs])
+    weights = np.array([pair[2] for pair in pairs], dtype=np.int64)
+    low, high = int(sd.min()), int(sd.max())
+    if (high - low) // 2 + 1 <= sd_bins:
+        sd_edges = np.arange(low - 1, high + 2, 2)
+    else:
+        sd_edges = np.linspace(low, high, sd_bins + 1)
+    counts, sd_edges, sr_edges = np.histogram2d(sd, sr, bins=[sd_edges, sr_edges], weights=weights)
+    return counts.astype(np.int64), sd_edges, sr_edges
+
+
+def plot_sd_sr_heatmap(sd_sr_combinations, output_filename, metadata, sd_bins=100, sr_bins=100, figsize=(16, 9),
+                       dpi=100):
+    """Draw the heatmap of sd_sr_heatmap on a logarithmic color scale (empty cells left blank) and save it to
+    output_filename."""
+    counts, sd_edges, sr_edges = sd_sr_heatmap(sd_sr_combinations, sd_bins, sr_bins)
+    fig = Figure(figsize=figsize, dpi=dpi)
+    ax = fig.subplots()
+    cells = np.ma.masked_equal(counts.T, 0)
+    mesh = ax.pcolormesh(sd_edges, sr_edges, cells, cmap="viridis",
+                         norm=LogNorm(vmin=1, vmax=max(int(counts.max()), 1)))
+    fig.colorbar(mesh, ax=ax, label="Count")
+    ax.set_xlabel("Second Difference")
+    ax.set_ylabel("Second Ratio")
+    ax.set_title(chart_title("Second Differences by Second Ratio", metadata))
+    fig.savefig(output_filename)
+    return output_filename
+
+
+def second_difference_chunks(filename, chunk_size=SECOND_DIFFERENCE_CHUNK):
+    """Yield the second differences of a dataset as int64 arrays of up to chunk_size values, from its compact state
+    file (.pdx) or its primes table (CSV, Parquet or Arrow), holding one chunk at a time."""
+    if filename.endswith(".pdx"):
+        with load_state_file(filename) as state:
+            num_gaps = len(state.gaps)
+            for start in range(0, num_gaps - 1, chunk_size):
+                # One gap of overlap, so the chunks' differences join up
+                gaps = np.array(state.gaps[start:start + chunk_size + 1], dtype=np.int64)
+                yield np.diff(gaps)
+    elif filename.endswith(CSV_OUTPUT_SUFFIXES):
+        with open_input_file(filename) as file:
+            reader = csv.reader(file)
+            next(reader)  # Header
+            values = map(int, map(itemgetter(1), reader))
+            while True:
+                chunk = np.fromiter(islice(values, chunk_size), dtype=np.int64)
+                if not len(chunk):
+                    break
+                yield chunk
+    else:
+        pyarrow = optional_module("pyarrow")
+        if pyarrow is None:
+            raise ImportError(f"Reading {filename} needs pyarrow to be installed")
+        if filename.endswith(".parquet"):
+            from pyarrow import parquet
+            batches = parquet.ParquetFile(filename).iter_batches(chunk_size, columns=["Second Difference"])
+        else:
+            from pyarrow import ipc
+            reader = ipc.open_file(pyarrow.memory_map(filename))
+            batches = (reader.get_batch(index).select(["Second Difference"])
+                       for index in range(reader.num_record_batches))
+        for batch in batches:
+            column = batch.column(0).drop_null().to_numpy()
+            if len(column):
+                yield column.astype(np.int64)
+
+
+def binned_second_differences(chunks, bin_size):
+    """Statistics of consecutive bins of bin_size second differences, from chunks of the sequence in order (as
+    second_difference_chunks yields them): a dict of arrays with one entry per bin for each of BIN_STATISTICS.
+    The last bin may be shorter. Only one chunk and one partial bin are held at a time."""
+    columns = {name: [] for name in BIN_STATISTICS}
+
+    def add_bins(values):
+        starts = np.arange(0, len(values), bin_size)
+        columns["count"].append(np.diff(np.append(starts, len(values))))
+        columns["sum"].append(np.add.reduceat(values, starts))
+        columns["abs_sum"].append(np.add.reduceat(np.abs(values), starts))
+        # In floating point, as squares of large gaps overflow int64
+        as_float = values.astype(np.float64)
+        columns["square_sum"].append(np.add.reduceat(as_float * as_float, starts))
+        columns["min"].append(np.minimum.reduceat(values, starts))
+        columns["max"].append(np.maximum.reduceat(values, starts))
+
+    pending = np.empty(0, dtype=np.int64)
+    for chunk in chunks:
+        values = np.concatenate((pending, chunk))
+        complete = len(values) - len(values) % bin_size
+        if complete:
+            add_bins(values[:complete])
+        pending = values[complete:]
+    if len(pending):
+        add_bins(pending)
+    return {name: np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+            for name, parts in columns.items()}
+
+
+def rolling_bin_statistics(binned, window_bins):
+    """Mean absolute second difference and root mean square second difference over a rolling window of
+    window_bins bins (fewer at the start), from cumulative sums of the bin statistics."""
+    ends = np.arange(1, len(binned["count"]) + 1)
+    starts = np.maximum(ends - window_bins, 0)
+    totals = {}
+    for name in ("count", "abs_sum", "square_sum"):
+        cumulative = np.concatenate(([0], np.cumsum(binned[name], dtype=np.float64)))
+        totals[name] = cumulative[ends] - cumulative[starts]
+    return totals["abs_sum"] / totals["count"], np.sqrt(totals["square_sum"] / totals["count"])
+
+
+def plot_sd_time_series(binned, output_filename, metadata, window=None, figsize=(16, 9), dpi=100):
+    """Draw the binned second differences of binned_second_differences against their position in the dataset: the
+    range of each bin, and the rolling mean absolute and root mean square second difference over window second
+    differences (ten bins by default). Save it to output_filename."""
+    counts = binned["count"]
+    fig = Figure(figsize=figsize, dpi=dpi)
+    ax = fig.subplots()
+    if len(counts):
+        bin_size = int(counts[0])
+        window_bins = max(1, round(window / bin_size)) if window else 10
+        positions = np.cumsum(counts)
+        mean_abs, rms = rolling_bin_statistics(binned, window_bins)
+        ax.fill_between(positions, binned["min"], binned["max"], step="pre", color="lightgray",
+                        label="Range per bin")
+        ax.plot(positions, binned["sum"] / counts, color="b", linewidth=0.5, label="Mean per bin")
+        ax.plot(positions, mean_abs, color="g", label=f"Rolling mean |SD| ({window_bins * bin_size} SDs)")
+        ax.plot(positions, rms, color="r", label=f"Rolling RMS ({window_bins * bin_size} SDs)")
+        ax.legend()
+    ax.set_xlabel("Second Difference Index")
+    ax.set_ylabel("Second Difference")
+    ax.set_title(chart_title("Second Differences over the Dataset", metadata))
+    fig.savefig(output_filename)
+    return output_filename
+
+
+def render_dataset_charts(directory_path, num_bins=2000, window=None, sr_bins=50, heatmap_sd_bins=100,
+                          heatmap_sr_bins=100, dpi=100):
+    """Render the static charts of the dataset in an output directory next to its outputs, and return their paths.
+
+    Each chart is skipped, with a message, when the output it is drawn from was not written: the distributions
+    need the _sd and _sr outputs, the heatmap the _sd_sr_combinations output, and the time series the compact
+    state file or the primes table. The time series has at most about num_bins bins.
+    """
+    prefix = os.path.basename(os.path.normpath(directory_path)).split("_")[0]
+    with open(os.path.join(directory_path, "metadata.json"), "r") as file:
+        metadata = json.load(file)
+
+    def output_path(name, chart, suffixes=CSV_OUTPUT_SUFFIXES):
+        filename = find_output_file(directory_path, f"{prefix}_{name}", suffixes)
+        if filename is None:
+            print(f"Skipping the {chart}: {directory_path} has no {name} output.")
+            return None
+        return os.path.join(directory_path, filename)
+
+    def chart_path(name):
+        return os.path.join(directory_path, f"{prefix}_{name}.png")
+
+    written = []
+    sd_filename = output_path("sd", "second difference distribution")
+    if sd_filename is not None:
+        written.append(plot_sd_distribution(read_counts_csv(sd_filename, int), chart_path("sd_distribution_plot"),
+                                            metadata, dpi=dpi))
+    sr_filename = output_path("sr", "second ratio distribution")
+    if sr_filename is not None:
+        written.append(plot_sr_distribution(read_counts_csv(sr_filename, str), chart_path("sr_distribution_plot"),
+                                            metadata, sr_bins, dpi=dpi))
+    combinations_filename = output_path("sd_sr_combinations", "SD-SR heatmap")
+    if combinations_filename is not None:
+        written.append(plot_sd_sr_heatmap(read_counts_csv(combinations_filename, int, str), chart_path("sd_sr_heatmap"),
+                                          metadata, heatmap_sd_bins, heatmap_sr_bins, dpi=dpi))
+    # The compact state file, when there is one, is much faster to read than the primes table
+    state_filename = find_output_file(directory_path, f"{prefix}_state", (".pdx",))
+    sequence_filename = (os.path.join(directory_path, state_filename) if state_filename is not None
+                         else output_path("primes", "second difference time series", PRIMES_TABLE_SUFFIXES))
+    if sequence_filename is not None:
+        num_second_differences = max(int(metadata["num_primes"]) - 2, 1)
+        bin_size = max(1, -(-num_second_differences // num_bins))
+        binned = binned_second_differences(second_difference_chunks(sequence_filename), bin_size)
+        written.append(plot_sd_time_series(binned, chart_path("sd_time_series"), metadata, window, dpi=dpi))
+    return written
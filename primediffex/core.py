@@ -0,0 +1,2558 @@
+'''
+PrimeDiffEx Prime DIfference Explorer - V0.22 Alpha 
+
+Changelog:  15 July 2023 v0.21
+• Support a Random Seed to allow control over the randomness.
+• Added Gzip to the Pickle file
+• Added selection of which named sets to save and total. 
+• Added a truncation parameter setting, and an "auto" setting to allow the best  fit truncation to the data. 
+• removed the README file from the output directory for a metadata.json with the truncation information. {Work remains to decide what goes in this file when there is no need for truncation}
+
+
+
+'''
+import ast
+import gzip
+import importlib
+import random
+from math import gcd, isqrt
+from operator import add, floordiv, itemgetter, sub
+from fractions import Fraction
+from collections import deque, Counter
+from collections.abc import Sequence
+from array import array
+from itertools import islice, compress, count, accumulate, groupby
+from functools import lru_cache
+from contextlib import contextmanager, redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+import time
+import json
+import csv
+import os
+from datetime import datetime
+import pickle
+import shutil
+import struct
+import mmap
+import sys
+import logging
+import sqlite3
+from itertools import product
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak memory is then not reported
+    resource = None
+
+# The public API, which "from primediffex import *" and the primediffex package export. The module global
+# "arithmetic" is left out: use_arithmetic_backend rebinds it, so an imported copy would go stale.
+__all__ = [
+    # Prime search
+    "optional_module", "TRIAL_DIVISION_PRIMES", "DETERMINISTIC_MR_BASES", "deterministic_bases",
+    "strong_probable_prime", "jacobi", "strong_lucas_probable_prime", "gmpy2_strong_probable_prime",
+    "ArithmeticBackend", "ARITHMETIC_BACKENDS", "PYTHON_ARITHMETIC", "use_arithmetic_backend", "SearchStats",
+    "miller_rabin", "bpsw", "is_probable_prime", "is_probable_prime_batch", "find_next_prime", "find_previous_prime",
+    "DEFAULT_SIEVE_WINDOW", "DEFAULT_SIEVE_PRIME_BOUND", "small_primes_up_to", "install_small_primes",
+    "init_search_worker", "sieve_segment", "sieved_candidates", "find_primes_in_range", "default_chunk_size",
+    "iter_primes_parallel", "iter_primes", "generate_prime_sequence", "find_prime_sequence", "generate_random_number",
+    # Second differences, second ratios and named prime sets
+    "calculate_second_differences", "second_differences_from_gaps", "MAX_RATIO_DENOMINATOR", "reduce_ratio",
+    "format_ratio", "format_ratio_counter", "RatioArray", "calculate_second_ratios", "second_ratios_from_gaps",
+    "StreamingAnalysis", "NumpyAnalysis", "create_analysis", "calculate_sd_sr_combinations", "NAMED_PRIME_SETS",
+    "NAMED_PRIME_TUPLES", "prime_tuple_name", "admissible_pattern", "PrimeTupleList", "NamedPrimeSets",
+    "named_set_total", "find_named_prime_sets",
+    # Output files
+    "create_output_directory", "write_output_to_csv", "write_sd_sr_combinations_to_csv",
+    "write_named_prime_sets_totals_to_csv", "write_named_prime_sets_to_csv", "write_metadata_file", "OUTPUT_BATCH_ROWS",
+    "OUTPUT_COMPRESSION_SUFFIXES", "CSV_OUTPUT_SUFFIXES", "open_output_file", "output_compression_of",
+    "open_input_file", "find_output_file", "row_batches", "write_csv_rows", "iter_truncated_primes", "prime_rows",
+    "write_primes_to_csv", "write_primes_columnar", "write_prime_rows", "write_second_differences_to_csv",
+    "write_second_ratios_to_csv", "read_counts_csv", "merge_counts", "merged_named_prime_set_rows",
+    # State files and checkpoints
+    "write_state_to_pickle", "STATE_MAGIC", "STATE_VERSION", "STATE_HEADER", "STATE_NUM_GAPS_OFFSET", "gap_typecode",
+    "write_state_file", "write_state_gaps", "write_state_header", "write_gap_array", "append_state_gaps",
+    "truncate_state_gaps", "CompactStateWriter", "CompactState", "is_compact_state_file", "load_state_file",
+    "load_pickle_file", "unload_variables_from_pickle_file", "CHECKPOINT_FILENAME", "write_checkpoint",
+    "load_checkpoint",
+    # Runs, sweeps and stores
+    "peak_rss_kib", "TIMING_BATCH_PRIMES", "RunInstrumentation", "generation_options", "run_from_config",
+    "StoredDataset", "extend_dataset", "sweep_configs", "run_sweep", "DistributionStore", "ratio_key",
+    "ingest_into_distribution_store",
+]
+
+# The optional dependencies are imported the first time they are needed, so that runs without them (and the worker
+# processes they start) do not pay for their import: "numpy" for the numpy analysis backend, "zstandard" for "zstd"
+# output_compression and "pyarrow" for the "parquet" and "arrow" primes_output_format. Returns None when the module
+# is not installed.
+@lru_cache(maxsize=None)
+def optional_module(name):
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+# Primes used for trial division before any Miller-Rabin round.
+TRIAL_DIVISION_PRIMES = [2, 3, 5, 7, 11, 13, 17, 19, 23]
+
+# Deterministic Miller-Rabin base sets: an odd n below the bound is prime if and only if it is a strong probable
+# prime to every base of the set (Jaeschke 1993; Sinclair 2011 for n < 2**64; Sorenson and Webster 2015).
+DETERMINISTIC_MR_BASES = [
+    (2047, (2,)),
+    (1373653, (2, 3)),
+    (9080191, (31, 73)),
+    (4759123141, (2, 7, 61)),
+    (1122004669633, (2, 13, 23, 1662803)),
+    (2152302898747, (2, 3, 5, 7, 11)),
+    (3474749660383, (2, 3, 5, 7, 11, 13)),
+    (341550071728321, (2, 3, 5, 7, 11, 13, 17)),
+    (2**64, (2, 325, 9375, 28178, 450775, 9780504, 1795265022)),
+    (318665857834031151167461, (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)),
+    (3317044064679887385961981, (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)),
+]
+
+# Return the smallest deterministic base set covering n, or None if n is beyond all of them.
+def deterministic_bases(n):
+    for bound, bases in DETERMINISTIC_MR_BASES:
+        if n < bound:
+            return bases
+    return None
+
+# Strong probable-prime test of an odd n > 3 to base a: the single round of Miller-Rabin.
+def strong_probable_prime(n, a):
+    r, s = 0, n - 1
+    while s % 2 == 0:
+        r += 1
+        s //= 2
+    a %= n
+    if a == 0:
+        return True
+    x = pow(a, s, n)
+    if x == 1 or x == n - 1:
+        return True
+    for _ in range(r - 1):
+        x = pow(x, 2, n)
+        if x == n - 1:
+            return True
+    return False
+
+# Jacobi symbol (a/n) for odd n > 0.
+def jacobi(a, n):
+    a %= n
+    result = 1
+    while a:
+        while a % 2 == 0:
+            a //= 2
+            if n % 8 in (3, 5):
+                result = -result
+        a, n = n, a
+        if a % 4 == 3 and n % 4 == 3:
+            result = -result
+        a %= n
+    return result if n == 1 else 0
+
+# Strong Lucas probable-prime test of an odd n > 3, with Selfridge's parameters: D is the first of 5, -7, 9, -11, ...
+# with Jacobi symbol (D/n) = -1, P = 1 and Q = (1 - D) / 4.
+def strong_lucas_probable_prime(n):
+    if isqrt(n) ** 2 == n:
+        return False  # No suitable D exists for a perfect square
+    D = 5
+    while True:
+        j = jacobi(D, n)
+        if j == -1:
+            break
+        if j == 0 and abs(D) != n:
+            return False
+        D = -D - 2 if D > 0 else -D + 2
+    P, Q = 1, (1 - D) // 4
+
+    # n + 1 = d * 2**s with d odd
+    d, s = n + 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+
+    # Compute U_d, V_d and Q**d modulo n, walking the bits of d from the top
+    U, V, Qk = 1, P, Q % n
+    for bit in bin(d)[3:]:
+        U = U * V % n
+        V = (V * V - 2 * Qk) % n
+        Qk = Qk * Qk % n
+        if bit == '1':
+            U, V = P * U + V, D * U + P * V
+            U = (U + n if U % 2 else U) // 2 % n
+            V = (V + n if V % 2 else V) // 2 % n
+            Qk = Qk * Q % n
+
+    if U == 0 or V == 0:
+        return True
+    for _ in range(s - 1):
+        V = (V * V - 2 * Qk) % n
+        Qk = Qk * Qk % n
+        if V == 0:
+            return True
+    return False
+
+# The strong probable-prime round of the gmpy2 arithmetic backend. gmpy2.is_strong_prp needs 1 < a < n with a coprime
+# to n; the other witnesses get the answer strong_probable_prime gives them (true for a = 0 or 1 modulo n, false
+# for a shared factor).
+def gmpy2_strong_probable_prime(n, a):
+    a %= n
+    if a < 2:
+        return True
+    if gcd(n, a) != 1:
+        return False
+    return optional_module("gmpy2").is_strong_prp(n, a)
+
+# The big-integer operations of the probable-prime tests: the strong probable-prime round, the strong Lucas test
+# and the gcd the candidates are screened with.
+class ArithmeticBackend:
+    def __init__(self, name, strong_probable_prime, strong_lucas_probable_prime, gcd):
+        self.name = name
+        self.strong_probable_prime = strong_probable_prime
+        self.strong_lucas_probable_prime = strong_lucas_probable_prime
+        self.gcd = gcd
+
+# Arithmetic backends: "python" works on Python ints, "gmpy2" hands the same operations to GMP through the gmpy2
+# package. The tests accept exactly the same numbers with the same witnesses on either, so a search finds the same
+# primes and draws the same witnesses; only its speed depends on the backend. "auto" is gmpy2 when it is installed.
+ARITHMETIC_BACKENDS = ("auto", "python", "gmpy2")
+PYTHON_ARITHMETIC = ArithmeticBackend("python", strong_probable_prime, strong_lucas_probable_prime, gcd)
+
+# The arithmetic backend of this process, set by use_arithmetic_backend.
+arithmetic = PYTHON_ARITHMETIC
+
+# Make the arithmetic backend name ("auto", "python" or "gmpy2") the one the primality tests of this process use.
+# Returns the name of the backend chosen.
+def use_arithmetic_backend(name="auto"):
+    global arithmetic
+    if name not in ARITHMETIC_BACKENDS:
+        raise ValueError(f"Unknown arithmetic_backend: {name!r} (expected 'auto', 'python' or 'gmpy2')")
+    gmpy2 = optional_module("gmpy2") if name != "python" else None
+    if name == "gmpy2" and gmpy2 is None:
+        raise ImportError("The gmpy2 arithmetic backend needs gmpy2 to be installed")
+    if gmpy2 is None:
+        arithmetic = PYTHON_ARITHMETIC
+    else:
+        arithmetic = ArithmeticBackend("gmpy2", gmpy2_strong_probable_prime, gmpy2.is_strong_selfridge_prp, gmpy2.gcd)
+    return arithmetic.name
+
+# Counters of the work done by a prime search. Passed down as stats to the primality tests and prime searches,
+# which count into it; every function taking stats also accepts None, the default, and then counts nothing.
+class SearchStats:
+    FIELDS = ("candidates_tested", "composites_prefiltered", "miller_rabin_rounds", "lucas_tests")
+
+    def __init__(self):
+        self.candidates_tested = 0  # Odd numbers examined, including those the sieve rejected
+        self.composites_prefiltered = 0  # Composites rejected by the sieve, trial division or gcd screening
+        self.miller_rabin_rounds = 0  # Strong probable-prime rounds run
+        self.lucas_tests = 0  # Strong Lucas tests run (bpsw only)
+
+    def merge(self, other):
+        for field in self.FIELDS:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+# Primality test of an odd n > 23 that has no factor among the trial division primes.
+# Below 3.3 * 10**24 the deterministic bases decide exactly. Beyond that, "miller_rabin" runs k rounds with random
+# witnesses drawn from rng, and "bpsw" runs Baillie-PSW (a base 2 round followed by a strong Lucas test).
+def _probable_prime_after_screening(n, k, rng, primality_test, stats=None):
+    bases = deterministic_bases(n)
+    if bases is None and primality_test == "bpsw":
+        if stats is not None:
+            stats.miller_rabin_rounds += 1
+        if not arithmetic.strong_probable_prime(n, 2):
+            return False
+        if stats is not None:
+            stats.lucas_tests += 1
+        return arithmetic.strong_lucas_probable_prime(n)
+    witnesses = bases if bases is not None else (rng.randrange(2, n - 1) for _ in range(k))
+    strong_probable_prime_round = arithmetic.strong_probable_prime
+    if stats is None:
+        return all(strong_probable_prime_round(n, a) for a in witnesses)
+    for a in witnesses:
+        stats.miller_rabin_rounds += 1
+        if not strong_probable_prime_round(n, a):
+            return False
+    return True
+
+# Trial division of n >= 2 by the trial division primes: True or False if that decides n, None if it does not.
+def _trial_division(n, stats=None):
+    for p in TRIAL_DIVISION_PRIMES:
+        if n % p == 0:
+            if stats is not None and n != p:
+                stats.composites_prefiltered += 1
+            return n == p
+    return None
+
+# The Miller-Rabin primality test is a probabilistic primality test: an algorithm which 
+# determines whether a given number is likely to be prime, similar to the Fermat primality test 
+# and the Solovay-Strassen primality test. Its original version, as described by Miller 
+# (who proved that the test is correct for all prime numbers) and extended by Rabin (who 
+# dealt with the composite, or non-prime, numbers), is deterministic, but the determinism 
+# relies on the unproven generalized Riemann hypothesis. Michael O. Rabin modified it to 
+# obtain an unconditional probabilistic algorithm.
+# Below 3.3 * 10**24 fixed base sets make it deterministic, and only larger n draw k random witnesses from rng
+# (which defaults to the global random module).
+def miller_rabin(n, k, rng=random, stats=None):  # number of tests
+    if stats is not None:
+        stats.candidates_tested += 1
+    if n < 2:
+        return False
+    screened = _trial_division(n, stats)
+    if screened is not None:
+        return screened
+    return _probable_prime_after_screening(n, k, rng, "miller_rabin", stats)
+
+# Baillie-PSW test: no composite passing it is known. Deterministic, so it needs no witnesses.
+def bpsw(n, stats=None):
+    if stats is not None:
+        stats.candidates_tested += 1
+    if n < 2:
+        return False
+    screened = _trial_division(n, stats)
+    if screened is not None:
+        return screened
+    return _probable_prime_after_screening(n, 0, None, "bpsw", stats)
+
+# Test n with the configured primality test: "miller_rabin" (k rounds beyond the deterministic range) or "bpsw".
+def is_probable_prime(n, miller_rabin_iterations, rng=random, primality_test="miller_rabin", stats=None):
+    if primality_test == "miller_rabin":
+        return miller_rabin(n, miller_rabin_iterations, rng, stats)
+    if primality_test == "bpsw":
+        return bpsw(n, stats)
+    raise ValueError(f"Unknown primality_test: {primality_test!r} (expected 'miller_rabin' or 'bpsw')")
+
+# Product of the primes below 1000 and their set, for screening batches of candidates with one gcd each.
+@lru_cache(maxsize=1)
+def _screening_primes():
+    primes = [2] + small_primes_up_to(997)
+    product = 1
+    for p in primes:
+        product *= p
+    return product, frozenset(primes)
+
+# Test many candidates at once. Small factors (primes below 1000) are screened with one gcd against their product
+# per candidate instead of trial division, and only the survivors get probable-prime rounds.
+# Returns a list of booleans in the order of candidates.
+def is_probable_prime_batch(candidates, miller_rabin_iterations=5, rng=random, primality_test="miller_rabin",
+                            stats=None):
+    if primality_test not in ("miller_rabin", "bpsw"):
+        raise ValueError(f"Unknown primality_test: {primality_test!r} (expected 'miller_rabin' or 'bpsw')")
+    product, screening_primes = _screening_primes()
+    screening_gcd = arithmetic.gcd
+    results = []
+    for n in candidates:
+        if n < 2:
+            results.append(False)
+        elif screening_gcd(n, product) != 1:
+            results.append(n in screening_primes)
+            if stats is not None and not results[-1]:
+                stats.composites_prefiltered += 1
+        else:
+            results.append(_probable_prime_after_screening(n, miller_rabin_iterations, rng, primality_test, stats))
+    if stats is not None:
+        stats.candidates_tested += len(results)
+    return results
+
+# Find the next prime number greater than the input number. Uses the Miller-Rabin primality test (or primality_test).
+def find_next_prime(start_number, miller_rabin_iterations, rng=random, primality_test="miller_rabin", stats=None):
+    if start_number % 2 == 0:
+        start_number += 1
+    else:
+        start_number += 2
+    number = start_number
+    while True:
+        is_prime = is_probable_prime(number, miller_rabin_iterations, rng, primality_test, stats)
+        if is_prime:
+            return number
+        number += 2
+
+# Find the largest prime smaller than the input number (at least 3), with the same primality test as find_next_prime.
+def find_previous_prime(number, miller_rabin_iterations, rng=random, primality_test="miller_rabin"):
+    if number <= 3:
+        raise ValueError(f"There is no odd prime below {number}")
+    number = number - 1 if number % 2 == 0 else number - 2
+    while not is_probable_prime(number, miller_rabin_iterations, rng, primality_test):
+        number -= 2
+    return number
+
+# Default number of odd candidates per sieve segment, and the bound on the small primes the segments are sieved by.
+DEFAULT_SIEVE_WINDOW = 1 << 16
+DEFAULT_SIEVE_PRIME_BOUND = 1 << 16
+
+# The small prime tables built so far, by limit. Worker processes are handed the tables of their parent (see
+# install_small_primes), so a pool shares one copy instead of each process sieving its own.
+_small_primes_tables = {}
+
+# Return the odd primes up to and including limit, using a plain sieve of Eratosthenes.
+# Cached, since every sieve segment and parallel chunk needs the same table.
+def small_primes_up_to(limit):
+    table = _small_primes_tables.get(limit)
+    if table is None:
+        if limit < 3:
+            return []
+        sieve = bytearray([1]) * (limit + 1)
+        sieve[0] = sieve[1] = 0
+        for p in range(2, int(limit ** 0.5) + 1):
+            if sieve[p]:
+                sieve[p * p::p] = bytes(len(range(p * p, limit + 1, p)))
+        table = _small_primes_tables[limit] = [p for p in range(3, limit + 1, 2) if sieve[p]]
+    return table
+
+# Pool initializer: add tables built by small_primes_up_to in another process to this process's cache, and
+# build the batch screening product from them.
+def install_small_primes(tables):
+    _small_primes_tables.update(tables)
+    _screening_primes()
+
+# Pool initializer of the parallel search: the small prime tables and the arithmetic backend of the parent.
+def init_search_worker(tables, arithmetic_backend):
+    install_small_primes(tables)
+    use_arithmetic_backend(arithmetic_backend)
+
+# Sieve the window of odd numbers low, low + 2, ..., low + 2 * (size - 1) (low must be odd) by the given odd primes.
+# Returns a bytearray with one flag per candidate: 1 if it has no factor among the small primes (other than itself).
+def sieve_segment(low, size, small_primes):
+    segment = bytearray([1]) * size
+    high = low + 2 * (size - 1)
+    for p in small_primes:
+        if p * p > high:
+            break
+        if p * p >= low:
+            index = (p * p - low) // 2
+        else:
+            # Smallest index with low + 2 * index divisible by p; (p + 1) // 2 is the inverse of 2 modulo p.
+            index = ((p - low % p) * ((p + 1) // 2)) % p
+        segment[index::p] = bytes(len(range(index, size, p)))
+    return segment
+
+# Yield, in increasing order, the odd numbers greater than start_number that survive a segmented sieve by the
+# odd primes up to sieve_prime_bound. Every prime greater than start_number (other than 2) is among them.
+def sieved_candidates(start_number, sieve_window=DEFAULT_SIEVE_WINDOW, sieve_prime_bound=DEFAULT_SIEVE_PRIME_BOUND):
+    small_primes = small_primes_up_to(sieve_prime_bound)
+    low = start_number + 1 if start_number % 2 == 0 else start_number + 2
+    while True:
+        segment = sieve_segment(low, sieve_window, small_primes)
+        for index in compress(range(sieve_window), segment):
+            yield low + 2 * index
+        low += 2 * sieve_window
+
+# Find every prime p with low < p <= high. Candidates come from prime_engine as in iter_primes, and Miller-Rabin
+# witnesses are drawn from a generator seeded with seed, so the result only depends on the arguments.
+# Module level so that it can be sent to worker processes.
+def find_primes_in_range(low, high, miller_rabin_iterations, seed, prime_engine="sequential",
+                         sieve_prime_bound=DEFAULT_SIEVE_PRIME_BOUND, primality_test="miller_rabin", stats=None):
+    rng = random.Random(seed)
+    first = low + 1 if low % 2 == 0 else low + 2
+    if first > high:
+        return []
+    size = (high - first) // 2 + 1
+    if prime_engine == "sequential":
+        candidates = range(first, high + 1, 2)
+    elif prime_engine == "sieve":
+        segment = sieve_segment(first, size, small_primes_up_to(sieve_prime_bound))
+        candidates = [first + 2 * index for index in compress(range(size), segment)]
+        if stats is not None:
+            stats.candidates_tested += size - len(candidates)
+            stats.composites_prefiltered += size - len(candidates)
+    else:
+        raise ValueError(f"Unknown prime_engine: {prime_engine!r} (expected 'sequential' or 'sieve')")
+    return list(compress(candidates, is_probable_prime_batch(candidates, miller_rabin_iterations, rng, primality_test,
+                                                             stats)))
+
+# find_primes_in_range for a worker process that also reports its search counters: returns (primes, stats).
+def _find_primes_in_range_with_stats(*arguments):
+    stats = SearchStats()
+    return find_primes_in_range(*arguments, stats=stats), stats
+
+# Default width of the chunks handed to worker processes: about 185 primes' worth of integers at this size.
+# It depends only on start_number, so the chunk layout is the same for any number of workers.
+def default_chunk_size(start_number):
+    return max(2, start_number.bit_length()) * 128
+
+# Yield the primes greater than start_number in increasing order, searching contiguous chunks
+# (start_number + i * chunk_size, start_number + (i + 1) * chunk_size] in a pool of num_workers processes.
+# Chunk i is tested with witnesses seeded from random_seed and i, and the chunks are yielded in order,
+# so the sequence does not depend on num_workers. With resume_after, only the primes above it are yielded,
+# starting from the chunk that contains it, so a resumed search continues exactly as the original would have.
+# The search counters of each chunk are merged into stats as the chunk is yielded.
+def iter_primes_parallel(start_number, miller_rabin_iterations, num_workers, random_seed, chunk_size=None,
+                         prime_engine="sequential", sieve_prime_bound=DEFAULT_SIEVE_PRIME_BOUND,
+                         primality_test="miller_rabin", resume_after=None, stats=None):
+    if chunk_size is None:
+        chunk_size = default_chunk_size(start_number)
+    first_chunk = 0
+    if resume_after is not None and resume_after > start_number:
+        first_chunk = (resume_after - start_number - 1) // chunk_size
+
+    def chunk_arguments(chunk_index):
+        low = start_number + chunk_index * chunk_size
+        return (low, low + chunk_size, miller_rabin_iterations, f"{random_seed}:{chunk_index}",
+                prime_engine, sieve_prime_bound, primality_test)
+
+    def chunk_primes_after_resume_point(chunk_result):
+        chunk_primes, chunk_stats = chunk_result
+        if stats is not None:
+            stats.merge(chunk_stats)
+        if resume_after is None:
+            return chunk_primes
+        return [prime for prime in chunk_primes if prime > resume_after]
+
+    if num_workers == 1:
+        for chunk_index in count(first_chunk):
+            chunk_result = _find_primes_in_range_with_stats(*chunk_arguments(chunk_index))
+            yield from chunk_primes_after_resume_point(chunk_result)
+        return
+
+    # Keep two chunks per worker in flight and collect them strictly in submission order.
+    small_primes_tables = {sieve_prime_bound: small_primes_up_to(sieve_prime_bound)} if prime_engine == "sieve" else {}
+    executor = ProcessPoolExecutor(max_workers=num_workers, initializer=init_search_worker,
+                                   initargs=(small_primes_tables, arithmetic.name))
+    try:
+        pending = deque()
+        chunk_indexes = count(first_chunk)
+        for chunk_index in islice(chunk_indexes, 2 * num_workers):
+            pending.append(executor.submit(_find_primes_in_range_with_stats, *chunk_arguments(chunk_index)))
+        while True:
+            chunk_result = pending.popleft().result()
+            pending.append(executor.submit(_find_primes_in_range_with_stats, *chunk_arguments(next(chunk_indexes))))
+            yield from chunk_primes_after_resume_point(chunk_result)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+# Yield the primes greater than start_number, in increasing order and without end.
+# The "sequential" engine runs Miller-Rabin on every odd candidate (find_next_prime), the "sieve" engine only on
+# the survivors of sieved_candidates. Both yield the same primes. With num_workers set, the search is split into
+# chunks and spread over a process pool (see iter_primes_parallel).
+# resume_after continues an interrupted search: only primes above it are yielded.
+# The work done is counted into stats (a SearchStats), if given.
+def iter_primes(start_number, miller_rabin_iterations, prime_engine="sequential",
+                sieve_window=DEFAULT_SIEVE_WINDOW, sieve_prime_bound=DEFAULT_SIEVE_PRIME_BOUND,
+                num_workers=None, random_seed=None, chunk_size=None, primality_test="miller_rabin", rng=random,
+                resume_after=None, stats=None):
+    if num_workers:
+        yield from iter_primes_parallel(start_number, miller_rabin_iterations, num_workers, random_seed,
+                                        chunk_size, prime_engine, sieve_prime_bound, primality_test, resume_after,
+                                        stats)
+        return
+    if resume_after is not None:
+        start_number = max(start_number, resume_after)
+    if prime_engine == "sequential":
+        current_number = start_number
+        while True:
+            current_number = find_next_prime(current_number, miller_rabin_iterations, rng, primality_test, stats)
+            yield current_number
+    elif prime_engine == "sieve":
+        previous = start_number if start_number % 2 else start_number - 1
+        for candidate in sieved_candidates(start_number, sieve_window, sieve_prime_bound):
+            if stats is not None:
+                # The odd numbers skipped since the previous survivor were rejected by the sieve
+                skipped = (candidate - previous) // 2 - 1
+                stats.candidates_tested += skipped
+                stats.composites_prefiltered += skipped
+                previous = candidate
+            if is_probable_prime(candidate, miller_rabin_iterations, rng, primality_test, stats):
+                yield candidate
+    else:
+        raise ValueError(f"Unknown prime_engine: {prime_engine!r} (expected 'sequential' or 'sieve')")
+
+# Yield num_primes consecutive primes above start_number as they are found, reporting progress when verbose.
+# Takes the same options as iter_primes. progress, if given, is called as progress(found, num_primes) at every
+# progress step (every 0.1%, or every prime for fewer than 1000) and once more at the end.
+def generate_prime_sequence(start_number, num_primes, miller_rabin_iterations, verbose, prime_engine="sequential",
+                            sieve_window=DEFAULT_SIEVE_WINDOW, sieve_prime_bound=DEFAULT_SIEVE_PRIME_BOUND,
+                            num_workers=None, random_seed=None, chunk_size=None, primality_test="miller_rabin",
+                            rng=random, resume_after=None, stats=None, progress=None):
+    prime_iterator = iter_primes(start_number, miller_rabin_iterations, prime_engine, sieve_window, sieve_prime_bound,
+                                 num_workers, random_seed, chunk_size, primality_test, rng, resume_after, stats)
+    progress_step = max(1, num_primes // 1000)  # Report progress every 0.1%
+    found = 0
+    while found < num_primes:
+        yield next(prime_iterator)
+        found += 1
+        if found % progress_step == 0 and found < num_primes:
+            if verbose:
+                print(f"\r{100.0 * found / num_primes:.1f} % done    ", end="")
+            if progress is not None:
+                progress(found, num_primes)
+    prime_iterator.close()  # Shuts down the worker pool of a parallel search
+    if progress is not None:
+        progress(found, num_primes)
+    if verbose:
+        print(f"\r{100.0} % done             ", end="")
+        print()  # Print a newline at the end to move the cursor to the next line
+
+# Find a sequence of prime numbers, starting from a specified number.
+def find_prime_sequence(start_number, num_primes, miller_rabin_iterations, verbose, **options):
+    return list(generate_prime_sequence(start_number, num_primes, miller_rabin_iterations, verbose, **options))
+
+# Calculate the second difference for a sequence of numbers.
+def calculate_second_differences(primes):
+    gaps = [b - a for a, b in zip(primes[:-1], primes[1:])]
+    return second_differences_from_gaps(gaps)
+
+# Second differences from the gaps between consecutive numbers.
+def second_differences_from_gaps(gaps):
+    return [b - a for a, b in zip(gaps[:-1], gaps[1:])]
+
+
+# Fraction.limit_denominator() keeps denominators up to 10**6 by default, so below that a reduced ratio is exact.
+MAX_RATIO_DENOMINATOR = 1000000
+
+# Reduce the second ratio sd / ss to lowest terms, as (numerator, denominator) with a positive denominator.
+# This is the value Fraction(sd, ss).limit_denominator() gives, without the continued-fraction search; only a
+# reduced denominator beyond 10**6 (a gap sum no prime gap comes near) falls back to it. (0, 0) stands for None.
+def reduce_ratio(sd, ss):
+    if ss == 0:
+        return 0, 0
+    divisor = gcd(sd, ss) if ss > 0 else -gcd(sd, ss)
+    numerator, denominator = sd // divisor, ss // divisor
+    if denominator > MAX_RATIO_DENOMINATOR:
+        ratio = Fraction(sd, ss).limit_denominator()
+        return ratio.numerator, ratio.denominator
+    return numerator, denominator
+
+# Format a reduced ratio the way str(Fraction) does ("-1/3", "0", "2"); a zero denominator (None) gives "".
+def format_ratio(numerator, denominator):
+    if denominator == 1:
+        return str(numerator)
+    if denominator == 0:
+        return ""
+    return f"{numerator}/{denominator}"
+
+# Re-key a Counter of (numerator, denominator) pairs by their strings as written to _sr.csv, keeping its order.
+def format_ratio_counter(pair_counter):
+    return Counter({format_ratio(n, d): count for (n, d), count in pair_counter.items()})
+
+# A sequence of second ratios held as two integer arrays of reduced numerators and denominators.
+# Items read back as Fractions (None where the denominator is 0), so it stands in for a list of Fractions, while
+# counting, CSV writing and pickling work on the arrays.
+class RatioArray(Sequence):
+    def __init__(self, numerators=(), denominators=()):
+        self.numerators = array('q', numerators)
+        self.denominators = array('q', denominators)
+
+    def append(self, numerator, denominator):
+        self.numerators.append(numerator)
+        self.denominators.append(denominator)
+
+    def __len__(self):
+        return len(self.numerators)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return RatioArray(self.numerators[index], self.denominators[index])
+        denominator = self.denominators[index]
+        return Fraction(self.numerators[index], denominator) if denominator else None
+
+    def __eq__(self, other):
+        if isinstance(other, RatioArray):
+            return self.numerators == other.numerators and self.denominators == other.denominators
+        if isinstance(other, Sequence):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"RatioArray([{', '.join(self.strings())}])"
+
+    # The ratios as strings, as str(Fraction) would write them
+    def strings(self):
+        return map(format_ratio, self.numerators, self.denominators)
+
+    # Counter of the ratios keyed by their strings, in order of first appearance
+    def counts(self):
+        return format_ratio_counter(Counter(zip(self.numerators, self.denominators)))
+
+# Calculate the second ratio for a sequence of numbers, as a RatioArray.
+def calculate_second_ratios(primes):
+    gaps = [b - a for a, b in zip(primes[:-1], primes[1:])]
+    return second_ratios_from_gaps(gaps)
+
+# Second ratios, as a RatioArray, from the gaps between consecutive numbers.
+def second_ratios_from_gaps(gaps):
+    second_differences = [b - a for a, b in zip(gaps[:-1], gaps[1:])]
+    second_sums = [a + b for a, b in zip(gaps[:-1], gaps[1:])]
+    if min(second_sums, default=1) <= 0:
+        # Not an increasing sequence: go through reduce_ratio for the zero and negative sums
+        return RatioArray(*zip(*map(reduce_ratio, second_differences, second_sums))) if second_sums else RatioArray()
+    divisors = list(map(gcd, second_differences, second_sums))
+    second_ratios = RatioArray(map(floordiv, second_differences, divisors), map(floordiv, second_sums, divisors))
+    if max(second_ratios.denominators, default=0) > MAX_RATIO_DENOMINATOR:
+        return RatioArray(*zip(*map(reduce_ratio, second_differences, second_sums)))
+    return second_ratios
+
+# Single-pass analysis of a stream of primes. Each prime is fed to add(), which keeps a three-prime window and
+# updates the second difference, second ratio, SD-SR combination and named prime set tallies in place, giving
+# the same results as calculate_second_differences, calculate_second_ratios, calculate_sd_sr_combinations and
+# find_named_prime_sets on the whole list. The full primes/SD/SR lists are only kept with keep_sequences;
+# otherwise memory grows with the number of distinct values (and named pairs) rather than with the primes.
+# Named prime sets and prime_tuples are found by a NamedPrimeSets with named_sets_storage (see there).
+class StreamingAnalysis:
+    def __init__(self, prime_sets, keep_sequences=True, prime_tuples=(), named_sets_storage="pairs",
+                 spill_prefix=None):
+        self.prime_sets = list(prime_sets)
+        self.keep_sequences = keep_sequences
+        self.window = deque(maxlen=3)
+        self.num_primes = 0
+        self.first_prime = None
+        self.sd_counter = Counter()
+        # Second ratios are counted as (numerator, denominator) pairs; see sr_counts and sd_sr_combinations
+        self.sr_counter = Counter()
+        self.sd_sr_counter = Counter()
+        self.named_sets = NamedPrimeSets(self.prime_sets, prime_tuples, named_sets_storage, spill_prefix)
+        self.primes = [] if keep_sequences else None
+        self.second_differences = [] if keep_sequences else None
+        self.second_ratios = RatioArray() if keep_sequences else None
+
+    @property
+    def last_prime(self):
+        return self.window[-1] if self.window else None
+
+    def add(self, prime):
+        window = self.window
+        if window:
+            gap = prime - window[-1]
+            # Most gaps match no pair, and only tuples or counts need to see them
+            if gap in self.named_sets.pair_index or self.named_sets.every_gap:
+                self.named_sets.add_gap(window[-1], gap)
+        else:
+            self.first_prime = prime
+        window.append(prime)
+        self.num_primes += 1
+        if self.keep_sequences:
+            self.primes.append(prime)
+
+        if len(window) == 3:
+            first_gap = window[1] - window[0]
+            second_gap = window[2] - window[1]
+            sd = second_gap - first_gap
+            numerator, denominator = reduce_ratio(sd, second_gap + first_gap)
+            self.sd_counter[sd] += 1
+            self.sr_counter[(numerator, denominator)] += 1
+            self.sd_sr_counter[(sd, numerator, denominator)] += 1
+            if self.keep_sequences:
+                self.second_differences.append(sd)
+                self.second_ratios.append(numerator, denominator)
+
+    def add_all(self, primes):
+        for prime in primes:
+            self.add(prime)
+        return self.finish()
+
+    # Continue a dataset that ends with the primes tail, which were analysed before: its last two, or as many as
+    # the named sets need (NamedPrimeSets.context_length) if more. The primes added next complete second
+    # differences and named sets with them, but nothing among the tail is counted again, so the tallies (and
+    # num_primes) cover only the new primes. With keep_sequences, primes starts with the last two of the tail.
+    def continue_after(self, tail):
+        self.window.extend(tail[-2:])
+        self.first_prime = tail[-2:][0]
+        self.named_sets.add_context(tail)
+        if self.keep_sequences:
+            self.primes.extend(tail[-2:])
+
+    # Bring the tallies up to date once the last prime is added. Nothing to do here: add() keeps them current.
+    def finish(self):
+        return self
+
+    # Counter of second ratios keyed by their strings, in the order write_second_ratios_to_csv needs.
+    def sr_counts(self):
+        return format_ratio_counter(self.sr_counter)
+
+    # Counter of (second difference, second ratio) pairs, as calculate_sd_sr_combinations would give.
+    def sd_sr_combinations(self):
+        return Counter({(sd, Fraction(n, d) if d else None): count
+                        for (sd, n, d), count in self.sd_sr_counter.items()})
+
+    # Pickled (for checkpoints) with the primes as their first value and an array of gaps.
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.primes:
+            gaps = [b - a for a, b in zip(self.primes[:-1], self.primes[1:])]
+            state['primes'] = (self.primes[0], array(gap_typecode(max(gaps, default=0)), gaps))
+        return state
+
+    def __setstate__(self, state):
+        if isinstance(state['primes'], tuple):
+            first_prime, gaps = state['primes']
+            state['primes'] = list(accumulate(gaps, initial=first_prime))
+        self.__dict__.update(state)
+
+    # The named prime sets (and prime tuples) by name, truncated to num_digits: sequences of tuples of strings as
+    # from find_named_prime_sets, computed as they are read, or only their totals with "counts" storage.
+    def named_prime_sets(self, num_digits):
+        return self.named_sets.results(num_digits)
+
+# The distinct values of one or more equal-length NumPy columns, as (keys, counts) in order of first appearance, which
+# is the key order of a Counter built from the same values and so gives the same most_common() ordering.
+# Keys are scalars for a single column and tuples for several.
+def _unique_in_order(*columns):
+    np = optional_module("numpy")
+    order = np.lexsort(columns[::-1])  # Stable, so each group starts with its first appearance
+    group_start = np.ones(len(order), dtype=bool)
+    for column in columns:
+        sorted_column = column[order]
+        group_start[1:] &= sorted_column[1:] == sorted_column[:-1]
+    group_start[1:] = ~group_start[1:]
+    starts = np.flatnonzero(group_start)
+    counts = np.diff(np.append(starts, len(order)))
+    appearance = np.argsort(order[starts], kind='stable')
+    starts = starts[appearance]
+    keys = [column[order[starts]].tolist() for column in columns]
+    return (keys[0] if len(columns) == 1 else list(zip(*keys))), counts[appearance].tolist()
+
+# StreamingAnalysis with the NumPy backend: add() only records the gaps, as a 32-bit int array, and finish()
+# computes the second differences with np.diff and the reduced second ratios with np.gcd, and groups the
+# distributions with _unique_in_order (a stable lexsort) rather than np.unique, which would sort the keys. Keys
+# are kept in order of first appearance because that is the order of the Counters of StreamingAnalysis, which the
+# CSV rows and the ties of most_common() follow. The primes themselves stay Python ints. Gives the same tallies
+# (and CSVs) as StreamingAnalysis.
+class NumpyAnalysis(StreamingAnalysis):
+    tail_gaps = 0  # Gaps among the primes of continue_after, which only complete matches of this analysis
+
+    def __init__(self, prime_sets, keep_sequences=True, prime_tuples=(), named_sets_storage="pairs",
+                 spill_prefix=None):
+        super().__init__(prime_sets, keep_sequences, prime_tuples, named_sets_storage, spill_prefix)
+        self.gaps = array('i')
+
+    def continue_after(self, tail):
+        super().continue_after(tail)
+        self.first_prime = tail[0]
+        self.gaps.extend(b - a for a, b in zip(tail[:-1], tail[1:]))
+        self.tail_gaps = len(self.gaps)
+
+    def add(self, prime):
+        if self.window:
+            self.gaps.append(prime - self.window[-1])
+        else:
+            self.first_prime = prime
+        self.window.append(prime)
+        self.num_primes += 1
+        if self.keep_sequences:
+            self.primes.append(prime)
+
+    def finish(self):
+        np = optional_module("numpy")
+        all_gaps = np.frombuffer(self.gaps, dtype=np.intc).astype(np.int64)
+        gaps = all_gaps[max(self.tail_gaps - 1, 0):]  # Only the last gap of the tail starts a second difference
+        sd = np.diff(gaps)
+        ss = gaps[:-1] + gaps[1:]
+        if len(ss) and (ss.min() <= 0 or ss.max() > MAX_RATIO_DENOMINATOR):
+            # Outside what a gcd alone reduces exactly (see reduce_ratio)
+            second_ratios = second_ratios_from_gaps(gaps.tolist())
+            numerators = np.array(second_ratios.numerators, dtype=np.int64)
+            denominators = np.array(second_ratios.denominators, dtype=np.int64)
+        else:
+            divisors = np.gcd(sd, ss)
+            numerators = sd // divisors
+            denominators = ss // divisors
+
+        self.sd_counter, self.sr_counter, self.sd_sr_counter = Counter(), Counter(), Counter()
+        if len(sd):
+            self.sd_counter = Counter(dict(zip(*_unique_in_order(sd))))
+            self.sr_counter = Counter(dict(zip(*_unique_in_order(numerators, denominators))))
+            self.sd_sr_counter = Counter(dict(zip(*_unique_in_order(sd, numerators, denominators))))
+
+        # Matches of each named set pattern: where its gaps follow each other, ending after the tail. The first
+        # prime of a match is the first prime plus the running sum of the gaps before it.
+        named_sets = self.named_sets
+        named_sets.origin = self.first_prime
+        offsets = np.concatenate(([0], np.cumsum(all_gaps)))
+        for index, pattern in enumerate(named_sets.patterns):
+            pattern_gaps = np.diff(pattern)
+            num_starts = len(all_gaps) - len(pattern_gaps) + 1
+            first_start = max(self.tail_gaps - len(pattern_gaps) + 1, 0)
+            if num_starts <= first_start:
+                continue
+            matches = np.ones(num_starts - first_start, dtype=bool)
+            for position, gap in enumerate(pattern_gaps):
+                matches &= all_gaps[first_start + position:num_starts + position] == gap
+            named_sets.record_offsets(index, offsets[np.flatnonzero(matches) + first_start])
+
+        if self.keep_sequences:
+            self.second_differences = sd.tolist()
+            self.second_ratios = RatioArray()
+            self.second_ratios.numerators.frombytes(numerators.astype(np.int64).tobytes())
+            self.second_ratios.denominators.frombytes(denominators.astype(np.int64).tobytes())
+        return self
+
+# Create the analysis for a run: "python" (StreamingAnalysis, the default) or "numpy" (NumpyAnalysis).
+def create_analysis(prime_sets, keep_sequences=True, analysis_backend="python", prime_tuples=(),
+                    named_sets_storage="pairs", spill_prefix=None):
+    if analysis_backend == "python":
+        return StreamingAnalysis(prime_sets, keep_sequences, prime_tuples, named_sets_storage, spill_prefix)
+    if analysis_backend == "numpy":
+        if optional_module("numpy") is None:
+            raise ImportError("The numpy analysis backend needs NumPy to be installed")
+        return NumpyAnalysis(prime_sets, keep_sequences, prime_tuples, named_sets_storage, spill_prefix)
+    raise ValueError(f"Unknown analysis_backend: {analysis_backend!r} (expected 'python' or 'numpy')")
+
+# Generate a random number with a specific number of bits.
+def generate_random_number(num_bits):
+    return random.randint(2**(num_bits-1), 2**num_bits - 1)
+
+# Create a directory to store dataset output files.
+def create_output_directory(num_bits, num_primes):
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    directory_name = f"{num_bits}bit{num_primes}_{timestamp}"
+    directory = os.path.join(os.getcwd(), directory_name)
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+# Write the sequence of primes with their second differences and second ratios to a CSV file.
+def write_output_to_csv(primes, sd, sr, base_filename):
+    filename = f"{base_filename}_primes.csv"
+    with open(filename, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(["Prime", "Second Difference", "Second Ratio (Fraction)", "Second Ratio (Decimal)"])
+        for i in range(len(sd)):  # Include all second differences and second ratios
+            writer.writerow([
+                str(primes[i+1])[-10:],  # Write the prime number associated with each second difference and second ratio
+                sd[i] if i < len(sd) else None, 
+                str(sr[i]) if i < len(sr) else None, 
+                float(sr[i]) if (i < len(sr) and sr[i] is not None) else None
+            ])
+            
+    filename = f"{base_filename}_sd.csv"
+    with open(filename, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(["Second Difference", "Count", "Percentage"])
+        sd_counter = Counter(sd)
+        total_count = len(sd)
+        for sd, count in sd_counter.most_common():
+            writer.writerow([sd, count, 100 * count / total_count])
+
+    filename = f"{base_filename}_sr.csv"
+    with open(filename, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(["Second Ratio (Fraction)", "Count", "Percentage"])
+        sr_counter = Counter(sr)
+        total_count = len(sr)
+        for sr, count in sr_counter.most_common():
+            writer.writerow([str(sr), count, 100 * count / total_count])
+
+    filename = f"{base_filename}_state.pkl.gz"
+    with gzip.open(filename, 'wb') as file:
+        pickle.dump((primes, sd, sr), file)
+
+def calculate_sd_sr_combinations(sd, sr):
+    sd_sr_combinations = list(zip(sd, sr))
+    return Counter(sd_sr_combinations)
+
+# Write the combinations of second differences and second ratios to a CSV file.
+def write_sd_sr_combinations_to_csv(sd_sr_combinations, base_filename, compression=None):
+    total_count = sum(sd_sr_combinations.values())
+    write_csv_rows(f"{base_filename}_sd_sr_combinations.csv",
+                   ["Second Difference", "Second Ratio (Fraction)", "Count", "Percentage"],
+                   ((sd, str(sr), count, 100 * count / total_count)
+                    for (sd, sr), count in sd_sr_combinations.most_common()), compression)
+
+        
+# The names associated with each prime set, by the gap between its two primes.
+# This dictionary could be extended if other prime sets become of interest
+NAMED_PRIME_SETS = {
+    2: "Twin primes",
+    4: "Cousin primes",
+    6: "Sexy primes",
+    8: "Octo primes",
+    10: "Deca primes",
+    12: "Dodeca primes"
+}
+
+# Names of prime k-tuples (runs of consecutive primes at the given offsets from the first) of interest, by pattern.
+NAMED_PRIME_TUPLES = {
+    (0, 2, 6): "Prime triplets (0, 2, 6)",
+    (0, 4, 6): "Prime triplets (0, 4, 6)",
+    (0, 2, 6, 8): "Prime quadruplets",
+    (0, 2, 6, 8, 12): "Prime quintuplets (0, 2, 6, 8, 12)",
+    (0, 4, 6, 10, 12): "Prime quintuplets (0, 4, 6, 10, 12)",
+    (0, 4, 6, 10, 12, 16): "Prime sextuplets",
+}
+
+# The name of a prime tuple pattern: that of its named prime set or named tuple, or one made from the pattern.
+def prime_tuple_name(pattern):
+    if len(pattern) == 2 and pattern[1] in NAMED_PRIME_SETS:
+        return NAMED_PRIME_SETS[pattern[1]]
+    return NAMED_PRIME_TUPLES.get(pattern, f"Prime {len(pattern)}-tuples {pattern}")
+
+# Check that a prime tuple pattern starts at 0, increases, and is admissible: for no prime p does it cover every
+# residue modulo p, which would make every match but a few small ones impossible. Returns it as a tuple.
+def admissible_pattern(pattern):
+    pattern = tuple(pattern)
+    if len(pattern) < 2 or pattern[0] != 0 or any(b <= a for a, b in zip(pattern[:-1], pattern[1:])):
+        raise ValueError(f"Prime tuple pattern {pattern} must be increasing offsets starting at 0")
+    for p in [2] + small_primes_up_to(len(pattern)):
+        if len({offset % p for offset in pattern}) == p:
+            raise ValueError(f"Prime tuple pattern {pattern} is not admissible: it covers every residue modulo {p}")
+    return pattern
+
+# The matches of one prime tuple pattern, read as tuples of the primes truncated to num_digits (the format of
+# find_named_prime_sets). Only the offset of each match's first prime from origin is stored: in an array, or in
+# a spill file of uint64 offsets.
+class PrimeTupleList(Sequence):
+    def __init__(self, origin, pattern, offsets, num_digits):
+        self.origin = origin
+        self.pattern = pattern
+        self.offsets = offsets
+        self.num_digits = num_digits
+
+    def __len__(self):
+        if isinstance(self.offsets, str):
+            return os.path.getsize(self.offsets) // 8
+        return len(self.offsets)
+
+    def _tuple(self, offset):
+        first = self.origin + offset
+        num_digits = -self.num_digits
+        if len(self.pattern) == 2:  # Pairs, by far the most common
+            return str(first)[num_digits:], str(first + self.pattern[1])[num_digits:]
+        return tuple([str(first + member)[num_digits:] for member in self.pattern])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("prime tuple index out of range")
+        if isinstance(self.offsets, str):
+            with open(self.offsets, 'rb') as file:
+                file.seek(8 * index)
+                return self._tuple(struct.unpack('<Q', file.read(8))[0])
+        return self._tuple(self.offsets[index])
+
+    def __iter__(self):
+        if not isinstance(self.offsets, str):
+            return map(self._tuple, self.offsets)
+        return map(self._tuple, self._spilled_offsets())
+
+    def _spilled_offsets(self):
+        with open(self.offsets, 'rb') as file:
+            while True:
+                chunk = array('Q', file.read(8 * OUTPUT_BATCH_ROWS))
+                if not chunk:
+                    return
+                if sys.byteorder != 'little':
+                    chunk.byteswap()
+                yield from chunk
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self):
+        return f"PrimeTupleList({list(self)!r})"
+
+# The named prime set engine: finds runs of consecutive primes that match patterns of offsets, the pairs of
+# prime_sets (the pattern (0, gap)) and the k-tuples of prime_tuples (such as (0, 2, 6, 8)), in one pass over the
+# gaps. add_gap() is called with each prime and the gap to the next. storage is how the matches are kept:
+#   "pairs": the offset of each match's first prime, in an array per pattern
+#   "stream": the same offsets written straight to a spill file per pattern, spill_prefix + "_<index>.part"
+#   "counts": only the totals, pairs from a histogram of every gap, with nothing stored per match
+class NamedPrimeSets:
+    STORAGES = ("pairs", "stream", "counts")
+
+    def __init__(self, prime_sets, prime_tuples=(), storage="pairs", spill_prefix=None):
+        if storage not in self.STORAGES:
+            raise ValueError(f"Unknown named_prime_sets_storage: {storage!r} (expected 'pairs', 'stream' or 'counts')")
+        if storage == "stream" and spill_prefix is None:
+            raise ValueError("Streaming the named prime sets needs a spill_prefix to write them to")
+        patterns = [(0, gap) for gap in prime_sets] + [admissible_pattern(pattern) for pattern in prime_tuples]
+        self.patterns = list(dict.fromkeys(patterns))
+        self.storage = storage
+        self.origin = None  # The first prime seen; matches are stored as offsets from it
+        # Pattern index by gap (pairs) and by the tuple of consecutive gaps (longer tuples)
+        self.pair_index = {pattern[1]: index for index, pattern in enumerate(self.patterns) if len(pattern) == 2}
+        self.tuple_index = {tuple(b - a for a, b in zip(pattern[:-1], pattern[1:])): index
+                            for index, pattern in enumerate(self.patterns) if len(pattern) > 2}
+        self.tuple_lengths = sorted({len(gaps) for gaps in self.tuple_index})
+        self.every_gap = storage == "counts" or bool(self.tuple_index)  # Else add_gap only needs the pair gaps
+        longest = max(self.tuple_lengths, default=0)
+        self.recent_gaps = deque(maxlen=longest)  # With the primes they start at, for the tuples
+        self.recent_lowers = deque(maxlen=longest)
+        self.counts = [0] * len(self.patterns)
+        self.gap_counts = Counter()
+        self.offsets = [array('Q') for _ in self.patterns] if storage == "pairs" else None
+        self.spill_filenames = None
+        self.spill_files = None
+        if storage == "stream":
+            self.spill_filenames = [f"{spill_prefix}_{index}.part" for index in range(len(self.patterns))]
+            self.spill_files = [open(filename, 'wb') for filename in self.spill_filenames]
+
+    # The number of primes before the end of a match that the search needs: one less than the longest pattern.
+    @property
+    def context_length(self):
+        return max(map(len, self.patterns), default=2) - 1
+
+    def record(self, index, first):
+        self.counts[index] += 1
+        if self.offsets is not None:
+            self.offsets[index].append(first - self.origin)
+        elif self.spill_files is not None:
+            self.spill_files[index].write((first - self.origin).to_bytes(8, 'little'))
+
+    # Record the matches, of the pattern at index, starting at these offsets from origin (a NumPy array of them).
+    def record_offsets(self, index, offsets):
+        self.counts[index] += len(offsets)
+        if self.offsets is not None:
+            self.offsets[index].frombytes(offsets.astype('<u8').tobytes())
+        elif self.spill_files is not None:
+            self.spill_files[index].write(offsets.astype('<u8').tobytes())
+
+    def add_gap(self, prime, gap):
+        if self.origin is None:
+            self.origin = prime
+        if self.storage == "counts":
+            self.gap_counts[gap] += 1
+        else:
+            index = self.pair_index.get(gap)
+            if index is not None:
+                self.record(index, prime)
+        if self.tuple_index:
+            self.recent_gaps.append(gap)
+            self.recent_lowers.append(prime)
+            recent_gaps = tuple(self.recent_gaps)
+            for length in self.tuple_lengths:
+                if length > len(recent_gaps):
+                    break
+                index = self.tuple_index.get(recent_gaps[-length:])
+                if index is not None:
+                    self.record(index, self.recent_lowers[-length])
+
+    # Take in the gaps between primes that were searched before (such as the end of a dataset being extended), so
+    # that matches ending in the primes added next are found, without recording any that end among them.
+    def add_context(self, primes):
+        if self.origin is None and primes:
+            self.origin = primes[0]
+        for prime, next_prime in zip(primes[:-1], primes[1:]):
+            self.recent_gaps.append(next_prime - prime)
+            self.recent_lowers.append(prime)
+
+    # The totals of every pattern, by name.
+    def totals(self):
+        totals = {}
+        for index, pattern in enumerate(self.patterns):
+            if self.storage == "counts" and len(pattern) == 2:
+                totals[prime_tuple_name(pattern)] = self.gap_counts[pattern[1]] + self.counts[index]
+            else:
+                totals[prime_tuple_name(pattern)] = self.counts[index]
+        return totals
+
+    # The matches of every pattern by name, as PrimeTupleLists truncated to num_digits, or with "counts" storage,
+    # their totals.
+    def results(self, num_digits):
+        if self.storage == "counts":
+            return self.totals()
+        if self.spill_files is not None:
+            for file in self.spill_files:
+                file.flush()
+        origin = self.origin if self.origin is not None else 0
+        matches = self.offsets if self.offsets is not None else self.spill_filenames
+        return {prime_tuple_name(pattern): PrimeTupleList(origin, pattern, offsets, num_digits)
+                for pattern, offsets in zip(self.patterns, matches)}
+
+    # Close and delete the spill files, once the named prime sets are written.
+    def remove_spill_files(self):
+        if self.spill_files is not None:
+            for file, filename in zip(self.spill_files, self.spill_filenames):
+                file.close()
+                os.remove(filename)
+            self.spill_files = None
+
+    # Pickled (for checkpoints) with the length of each spill file, to which it is cut back on unpickling, so
+    # that a resumed run drops the matches found after the checkpoint.
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.spill_files is not None:
+            for file in self.spill_files:
+                file.flush()
+            state['spill_files'] = [file.tell() for file in self.spill_files]
+        return state
+
+    def __setstate__(self, state):
+        spill_sizes = state['spill_files']
+        if spill_sizes is not None:
+            state['spill_files'] = []
+            for filename, size in zip(state['spill_filenames'], spill_sizes):
+                file = open(filename, 'r+b')
+                file.truncate(size)
+                file.seek(size)
+                state['spill_files'].append(file)
+        self.__dict__.update(state)
+
+# The total of a named prime set in the results of NamedPrimeSets: its number of matches, or the count itself.
+def named_set_total(matches):
+    return matches if isinstance(matches, int) else len(matches)
+
+# Find sets of primes with specific differences (named prime sets, like "twin primes"), and the prime k-tuples
+# of prime_tuples, in a list of primes. Returns lists of tuples of the primes truncated to num_digits, by name.
+def find_named_prime_sets(primes, prime_sets, num_digits, prime_tuples=()):
+    named_sets = NamedPrimeSets(prime_sets, prime_tuples)
+    for prime, next_prime in zip(primes[:-1], primes[1:]):
+        gap = next_prime - prime
+        if gap in named_sets.pair_index or named_sets.every_gap:
+            named_sets.add_gap(prime, gap)
+    return {name: list(matches) for name, matches in named_sets.results(num_digits).items()}
+
+
+# Write the totals of named prime sets to a CSV file.
+def write_named_prime_sets_totals_to_csv(named_prime_sets, base_filename, compression=None):
+    write_csv_rows(f"{base_filename}_named_prime_sets_totals.csv", ["Name", "Total"],
+                   ((name, named_set_total(named_prime_sets[name])) for name in named_prime_sets.keys()),
+                   compression)
+
+            
+# Write the named prime sets to a CSV file.            
+def write_named_prime_sets_to_csv(named_prime_sets, base_filename, compression=None):
+    write_csv_rows(f"{base_filename}_named_prime_sets.csv", ["Name", "Prime Set"],
+                   ((name, prime_set) for name in named_prime_sets.keys() for prime_set in named_prime_sets[name]),
+                   compression)
+
+# Write metadata.json, with the run's instrumentation report (see RunInstrumentation) if given.
+def write_metadata_file(output_directory, first_prime, last_prime, num_bits, num_primes, num_digits,
+                        instrumentation=None):
+    metadata = {
+        "first_prime": first_prime,
+        "last_prime": last_prime,
+        "num_bits": num_bits,
+        "num_primes": num_primes,
+        "num_digits": num_digits,
+        "left_digits": str(first_prime)[:-num_digits] if len(str(first_prime)) > num_digits else str(first_prime)
+    }
+    if instrumentation is not None:
+        metadata["instrumentation"] = instrumentation
+    with open(os.path.join(output_directory, "metadata.json"), 'w') as metadata_file:
+        json.dump(metadata, metadata_file, indent=4)
+
+# Rows handed to the CSV writer at a time, and rows per record batch of the columnar primes output.
+OUTPUT_BATCH_ROWS = 1 << 16
+
+# The CSV output compressions, by the suffix they add to the filename, and the endings of CSV output filenames.
+OUTPUT_COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+CSV_OUTPUT_SUFFIXES = tuple(".csv" + suffix for suffix in OUTPUT_COMPRESSION_SUFFIXES.values())
+
+# Open an output CSV file for writing (or appending to), compressed with output_compression: None, "gzip" or
+# "zstd". The compression's suffix (".gz", ".zst") is added to filename. Appending to a compressed file adds a
+# new gzip member or zstd frame, which readers decompress as one stream.
+def open_output_file(filename, compression=None, append=False):
+    if compression not in OUTPUT_COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unknown output_compression: {compression!r} (expected None, 'gzip' or 'zstd')")
+    filename += OUTPUT_COMPRESSION_SUFFIXES[compression]
+    mode = 'a' if append else 'w'
+    if compression == "gzip":
+        return gzip.open(filename, mode + 't', newline='', compresslevel=6)
+    if compression == "zstd":
+        zstandard = optional_module("zstandard")
+        if zstandard is None:
+            raise ImportError("zstd output compression needs the zstandard package to be installed")
+        return zstandard.open(filename, mode + 't', newline='')
+    return open(filename, mode, newline='', buffering=1 << 20)
+
+# The output_compression an output filename was written with, from its suffix.
+def output_compression_of(filename):
+    for compression, suffix in OUTPUT_COMPRESSION_SUFFIXES.items():
+        if suffix and filename.endswith(suffix):
+            return compression
+    return None
+
+# Open an output CSV file, compressed or not, for reading with the csv module.
+def open_input_file(filename):
+    compression = output_compression_of(filename)
+    if compression == "gzip":
+        return gzip.open(filename, 'rt', newline='')
+    if compression == "zstd":
+        zstandard = optional_module("zstandard")
+        if zstandard is None:
+            raise ImportError("Reading zstd output needs the zstandard package to be installed")
+        return zstandard.open(filename, 'rt', newline='')
+    return open(filename, 'r', newline='')
+
+# The filename in directory_path of the output name (such as '10bit1000_sd') in the first of the given formats that
+# exists, or None.
+def find_output_file(directory_path, name, suffixes=CSV_OUTPUT_SUFFIXES):
+    for suffix in suffixes:
+        if os.path.isfile(os.path.join(directory_path, name + suffix)):
+            return name + suffix
+    return None
+
+# Split an iterable of rows into lists of at most OUTPUT_BATCH_ROWS rows.
+def row_batches(rows):
+    rows = iter(rows)
+    return iter(lambda: list(islice(rows, OUTPUT_BATCH_ROWS)), [])
+
+# Write a header and then rows to an output CSV file, a batch at a time. With append, the rows are added to the
+# end of the existing file and no header is written.
+def write_csv_rows(filename, header, rows, compression=None, append=False):
+    with open_output_file(filename, compression, append) as file:
+        writer = csv.writer(file)
+        if not append:
+            writer.writerow(header)
+        for batch in row_batches(rows):
+            writer.writerows(batch)
+
+# Yield first_prime and the primes after it, given the gaps between them, as str(prime)[-num_digits:] gives them.
+# The digits are carried forward modulo 10**num_digits from the gaps instead of converting every (possibly
+# 1024-bit) prime to decimal.
+def iter_truncated_primes(first_prime, gaps, num_digits):
+    if num_digits < 1:  # str(prime)[-0:] is the whole prime
+        for prime in accumulate(gaps, initial=first_prime):
+            yield str(prime)[-num_digits:]
+        return
+    modulus = 10 ** num_digits
+    zero_padded = f"%0{num_digits}d".__mod__
+    low_digits = first_prime % modulus
+    if first_prime >= modulus:
+        # Every prime is longer than num_digits and keeps its leading zeros: no per-prime Python code needed
+        yield from map(zero_padded, map(modulus.__rmod__, accumulate(gaps, initial=low_digits)))
+        return
+    wrapped = False  # Primes of at most num_digits digits are written in full, without leading zeros
+    yield str(low_digits)
+    for gap in gaps:
+        low_digits += gap
+        if low_digits >= modulus:
+            low_digits %= modulus
+            wrapped = True
+        yield zero_padded(low_digits) if wrapped else str(low_digits)
+
+# The rows of the primes output: each prime that has a second difference, truncated to num_digits, with its
+# second difference and second ratio.
+def prime_rows(primes, second_differences, second_ratios, num_digits):
+    if not primes:
+        return iter(())
+    if isinstance(second_ratios, RatioArray):
+        second_ratios = second_ratios.strings()
+    gaps = map(sub, islice(primes, 1, None), primes)
+    truncated_primes = iter_truncated_primes(primes[0], gaps, num_digits)
+    return zip(islice(truncated_primes, 1, None), second_differences, second_ratios)
+
+# Write the primes, second differences, and second ratios to a CSV file, or with append add them to its end.
+def write_primes_to_csv(primes, second_differences, second_ratios, base_filename, num_digits, compression=None,
+                        append=False):
+    write_prime_rows(prime_rows(primes, second_differences, second_ratios, num_digits), base_filename, "csv",
+                     compression, append)
+
+# Write the primes table (the rows of write_primes_to_csv) in a columnar format, "parquet" (_primes.parquet) or
+# "arrow" (_primes.arrow, an Arrow IPC file, which pandas reads with read_feather), so it loads without parsing.
+# With append, the rows follow those of the existing file: neither format can grow in place, so its record
+# batches are copied into a new file first. Needs pyarrow. Returns the filename.
+def write_primes_columnar(primes, second_differences, second_ratios, base_filename, num_digits,
+                          output_format="parquet", append=False):
+    return write_prime_rows(prime_rows(primes, second_differences, second_ratios, num_digits), base_filename,
+                            output_format, append=append)
+
+# Write rows of the primes table (such as those of prime_rows) as primes_output_format "csv" (compressed with
+# compression), "parquet" or "arrow", or with append add them to the end of the existing table. Returns the
+# filename.
+def write_prime_rows(rows, base_filename, primes_output_format="csv", compression=None, append=False):
+    if primes_output_format == "csv":
+        write_csv_rows(base_filename + "_primes.csv", ["Prime", "Second Difference", "Second Ratio"], rows,
+                       compression, append)
+        return base_filename + "_primes.csv" + OUTPUT_COMPRESSION_SUFFIXES[compression]
+    output_format = primes_output_format
+    if output_format not in ("parquet", "arrow"):
+        raise ValueError(f"Unknown primes_output_format: {output_format!r} (expected 'csv', 'parquet' or 'arrow')")
+    pyarrow = optional_module("pyarrow")
+    if pyarrow is None:
+        raise ImportError(f"The {output_format} primes output needs pyarrow to be installed")
+    schema = pyarrow.schema([("Prime", pyarrow.string()), ("Second Difference", pyarrow.int64()),
+                             ("Second Ratio", pyarrow.string())])
+    if output_format == "parquet":
+        from pyarrow import parquet
+        filename = f"{base_filename}_primes.parquet"
+        writer = parquet.ParquetWriter(filename + ".tmp" if append else filename, schema)
+        existing_batches = lambda: parquet.ParquetFile(filename).iter_batches(OUTPUT_BATCH_ROWS)
+    else:
+        from pyarrow import ipc
+        filename = f"{base_filename}_primes.arrow"
+        writer = ipc.new_file(filename + ".tmp" if append else filename, schema)
+
+        def existing_batches():
+            reader = ipc.open_file(pyarrow.memory_map(filename))
+            return (reader.get_batch(index) for index in range(reader.num_record_batches))
+    with writer:
+        if append:
+            for batch in existing_batches():
+                writer.write_batch(batch)
+        for batch in row_batches(rows):
+            columns = [pyarrow.array(column, type=field.type) for column, field in zip(zip(*batch), schema)]
+            writer.write_batch(pyarrow.record_batch(columns, schema=schema))
+    if append:
+        os.replace(filename + ".tmp", filename)
+    return filename
+
+# Write the second differences to a CSV file. Takes either the list of second differences or their Counter.
+def write_second_differences_to_csv(second_differences, base_filename, compression=None):
+    sd_counter = second_differences if isinstance(second_differences, Counter) else Counter(second_differences)
+    total_counts = sum(sd_counter.values())
+    write_csv_rows(base_filename + "_sd.csv", ["Second Difference", "Count", "Percentage"],
+                   ((sd, count, count / total_counts * 100) for sd, count in sd_counter.most_common()), compression)
+
+            
+# Write the second ratios to a CSV file. Takes the second ratios (a list or RatioArray) or their Counter.
+def write_second_ratios_to_csv(second_ratios, base_filename, compression=None):
+    if isinstance(second_ratios, Counter):
+        sr_counter = second_ratios
+    elif isinstance(second_ratios, RatioArray):
+        sr_counter = second_ratios.counts()
+    else:
+        sr_counter = Counter(second_ratios)
+    total_counts = sum(sr_counter.values())
+    write_csv_rows(base_filename + "_sr.csv", ["Second Ratio", "Count", "Percentage"],
+                   ((sr, count, count / total_counts * 100) for sr, count in sr_counter.most_common()), compression)
+            
+def write_state_to_pickle(primes, sd, sr, base_filename):
+    filename = f"{base_filename}_state.pkl.gz"
+    with gzip.open(filename, 'wb') as file:
+        pickle.dump((primes, sd, sr), file)
+
+
+# Compact binary state file ("_state.pdx"). Instead of every prime it stores the first prime once and then the gaps
+# between consecutive primes as a little-endian uint16 array (uint32 if a gap does not fit), from which the primes,
+# second differences and second ratios are derived. Layout:
+#   header: magic, format version, gap typecode ('H' or 'I'), byte length of the first prime, number of gaps
+#   first prime: unsigned little-endian bytes, then zero padding to a multiple of 8
+#   gaps: num_gaps entries of the typecode's size
+# The gap array sits at an aligned offset so it can be read in place from a memory map.
+STATE_MAGIC = b"PDXSTATE"
+STATE_VERSION = 1
+STATE_HEADER = struct.Struct("<8sBc2xIQ")
+STATE_NUM_GAPS_OFFSET = 16  # Position of the number of gaps in the header
+
+# The array typecode able to hold every gap: 'H' (uint16) when they all fit, otherwise 'I' (uint32).
+def gap_typecode(max_gap):
+    if max_gap < 1 << 16:
+        return 'H'
+    if max_gap < 1 << 32:
+        return 'I'
+    raise ValueError(f"Prime gap {max_gap} does not fit in the compact state format")
+
+# Write the compact state file for primes and return its filename.
+def write_state_file(primes, base_filename):
+    gaps = [b - a for a, b in zip(primes[:-1], primes[1:])]
+    return write_state_gaps(f"{base_filename}_state.pdx", primes[0] if primes else 0, gaps)
+
+# Write a compact state file holding first_prime and the gaps after it.
+def write_state_gaps(filename, first_prime, gaps):
+    typecode = gap_typecode(max(gaps, default=0))
+    with open(filename, 'wb') as file:
+        write_state_header(file, first_prime, typecode, len(gaps))
+        write_gap_array(file, typecode, gaps)
+    return filename
+
+# Write the header and first prime of a compact state file of num_gaps gaps, up to where its gaps start.
+def write_state_header(file, first_prime, typecode, num_gaps):
+    first_prime_bytes = first_prime.to_bytes((first_prime.bit_length() + 7) // 8 or 1, 'little')
+    file.write(STATE_HEADER.pack(STATE_MAGIC, STATE_VERSION, typecode.encode(), len(first_prime_bytes), num_gaps))
+    file.write(first_prime_bytes)
+    file.write(bytes(-(STATE_HEADER.size + len(first_prime_bytes)) % 8))
+
+# Write gaps as little-endian entries of typecode.
+def write_gap_array(file, typecode, gaps):
+    gap_array = array(typecode, gaps)
+    if sys.byteorder != 'little':
+        gap_array.byteswap()
+    gap_array.tofile(file)
+    return len(gap_array)
+
+# Append the gaps to the primes after the last one to a compact state file. The gaps are written at the end and
+# the gap count in the header updated, in place, unless a new gap does not fit the file's 16-bit gaps: then the
+# file is rewritten with 32-bit gaps, a batch at a time.
+def append_state_gaps(filename, gaps):
+    with load_state_file(filename) as state:
+        num_gaps = len(state.gaps)
+        if state.typecode == 'H' and gap_typecode(max(gaps, default=0)) == 'I':
+            with open(filename + ".tmp", 'wb') as file:
+                write_state_header(file, state.first_prime, 'I', num_gaps + len(gaps))
+                for start in range(0, num_gaps, OUTPUT_BATCH_ROWS):
+                    write_gap_array(file, 'I', state.gaps[start:start + OUTPUT_BATCH_ROWS])
+                write_gap_array(file, 'I', gaps)
+            typecode = None
+        else:
+            typecode = state.typecode
+    if typecode is None:
+        os.replace(filename + ".tmp", filename)
+        return filename
+    with open(filename, 'r+b') as file:
+        file.seek(0, os.SEEK_END)
+        num_gaps += write_gap_array(file, typecode, gaps)
+        file.seek(STATE_NUM_GAPS_OFFSET)
+        file.write(struct.pack('<Q', num_gaps))
+    return filename
+
+# Cut a compact state file back to its first num_gaps gaps.
+def truncate_state_gaps(filename, num_gaps):
+    with load_state_file(filename) as state:
+        size = state.gaps_offset + num_gaps * array(state.typecode).itemsize
+    with open(filename, 'r+b') as file:
+        file.truncate(size)
+        file.seek(STATE_NUM_GAPS_OFFSET)
+        file.write(struct.pack('<Q', num_gaps))
+    return filename
+
+# Write a compact state file prime by prime, holding no more than a batch of gaps in memory: they are appended to
+# the file (see append_state_gaps) every OUTPUT_BATCH_ROWS primes and on close().
+class CompactStateWriter:
+    def __init__(self, filename):
+        self.filename = filename
+        self.last_prime = None
+        self.num_gaps = 0  # Gaps in the file so far
+        self.gaps = []
+
+    def add(self, prime):
+        if self.last_prime is None:
+            write_state_gaps(self.filename, prime, [])
+        else:
+            self.gaps.append(prime - self.last_prime)
+            if len(self.gaps) >= OUTPUT_BATCH_ROWS:
+                self.flush()
+        self.last_prime = prime
+
+    def flush(self):
+        if self.gaps:
+            append_state_gaps(self.filename, self.gaps)
+            self.num_gaps += len(self.gaps)
+            self.gaps = []
+
+    def close(self):
+        self.flush()
+        return self.filename
+
+    # Pickled (for checkpoints) once its gaps are written, with their number, to which the file is cut back on
+    # unpickling, so that a resumed run drops the gaps written after the checkpoint.
+    def __getstate__(self):
+        self.flush()
+        return self.__dict__.copy()
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.last_prime is not None:
+            truncate_state_gaps(self.filename, self.num_gaps)
+
+# A compact state file opened for reading. The gaps are a memoryview straight onto a memory map of the file (a copy
+# only on big-endian machines); primes, second differences and second ratios are derived from them on request.
+class CompactState:
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, typecode, first_prime_length, num_gaps = STATE_HEADER.unpack_from(self._map)
+        if magic != STATE_MAGIC:
+            raise ValueError(f"{filename} is not a compact state file")
+        if version != STATE_VERSION:
+            raise ValueError(f"{filename} has unsupported state format version {version}")
+        offset = STATE_HEADER.size
+        self.first_prime = int.from_bytes(self._map[offset:offset + first_prime_length], 'little')
+        offset += first_prime_length
+        offset += -offset % 8
+        self.gaps_offset = offset
+        self.typecode = typecode = typecode.decode()
+        gap_bytes = memoryview(self._map)[offset:offset + num_gaps * array(typecode).itemsize]
+        if sys.byteorder == 'little':
+            self.gaps = gap_bytes.cast(typecode)
+        else:
+            self.gaps = array(typecode, gap_bytes)
+            self.gaps.byteswap()
+            gap_bytes.release()
+        self.num_primes = num_gaps + 1
+
+    def iter_primes(self):
+        return accumulate(self.gaps, initial=self.first_prime)
+
+    @property
+    def primes(self):
+        return list(self.iter_primes())
+
+    @property
+    def last_prime(self):
+        return self.first_prime + sum(self.gaps)
+
+    @property
+    def second_differences(self):
+        return second_differences_from_gaps(self.gaps)
+
+    @property
+    def second_ratios(self):
+        return second_ratios_from_gaps(self.gaps)
+
+    def iter_second_differences(self):
+        return map(sub, islice(self.gaps, 1, None), self.gaps)
+
+    # The second ratios as (numerator, denominator) pairs, reduced as by reduce_ratio.
+    def iter_second_ratio_pairs(self):
+        return map(reduce_ratio, self.iter_second_differences(), map(add, islice(self.gaps, 1, None), self.gaps))
+
+    # The second ratios as Fractions (None where the denominator is 0), as a RatioArray reads them.
+    def iter_second_ratios(self):
+        return (Fraction(numerator, denominator) if denominator else None
+                for numerator, denominator in self.iter_second_ratio_pairs())
+
+    # The rows of the primes output (see prime_rows), computed from the gaps as they are read.
+    def iter_rows(self, num_digits):
+        truncated_primes = iter_truncated_primes(self.first_prime, self.gaps, num_digits)
+        second_ratios = (format_ratio(*pair) for pair in self.iter_second_ratio_pairs())
+        return zip(islice(truncated_primes, 1, None), self.iter_second_differences(), second_ratios)
+
+    # The (primes, sd, sr) tuple the state pickle holds.
+    def as_tuple(self):
+        return self.primes, self.second_differences, self.second_ratios
+
+    def close(self):
+        if isinstance(self.gaps, memoryview):
+            self.gaps.release()
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# Whether filename starts with the compact state file magic.
+def is_compact_state_file(filename):
+    with open(filename, 'rb') as file:
+        return file.read(len(STATE_MAGIC)) == STATE_MAGIC
+
+# Open a compact state file without deriving anything from it yet.
+def load_state_file(state_file_path):
+    return CompactState(state_file_path)
+
+# Load a state file, either the gzip pickle or the compact format, as the (primes, sd, sr) tuple.
+def load_pickle_file(pickle_file_path):
+    if is_compact_state_file(pickle_file_path):
+        with load_state_file(pickle_file_path) as state:
+            return state.as_tuple()
+    with gzip.open(pickle_file_path, 'rb') as file:
+        data = pickle.load(file)
+    return data
+
+def unload_variables_from_pickle_file(pickle_file_path):
+    # Define a list of variable names that we expect to be loaded from the pickle file
+    variable_names = ['primes', 'sd', 'sr', 'sd_sr_combinations', 'named_prime_sets']
+
+    # Get the current global and local symbol tables
+    global_vars = globals()
+    local_vars = locals()
+
+    # Delete the variables from the global and local symbol tables
+    for var_name in variable_names:
+        if var_name in global_vars:
+            del global_vars[var_name]
+        if var_name in local_vars:
+            del local_vars[var_name]
+
+            
+
+# Name of the checkpoint file written to the output directory of a run with checkpoint_interval.
+CHECKPOINT_FILENAME = "checkpoint.pkl.gz"
+
+# Write a checkpoint (a dict of everything needed to continue the run) to output_directory, atomically replacing
+# the previous one so that an interruption while writing never leaves a broken checkpoint behind.
+def write_checkpoint(output_directory, checkpoint):
+    filename = os.path.join(output_directory, CHECKPOINT_FILENAME)
+    temporary_filename = filename + ".tmp"
+    with gzip.open(temporary_filename, 'wb', compresslevel=1) as file:
+        pickle.dump(checkpoint, file)
+    os.replace(temporary_filename, filename)
+    return filename
+
+# Load a checkpoint, given either the checkpoint file or the output directory that holds it.
+def load_checkpoint(path):
+    if os.path.isdir(path):
+        path = os.path.join(path, CHECKPOINT_FILENAME)
+    with gzip.open(path, 'rb') as file:
+        checkpoint = pickle.load(file)
+    checkpoint['output_directory'] = os.path.dirname(os.path.abspath(path))
+    return checkpoint
+
+# Peak resident set size of this process in KiB, or None where the resource module is unavailable.
+def peak_rss_kib():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # macOS reports bytes, Linux KiB
+
+# Primes generated, and then analysed, between two readings of the stage clocks
+TIMING_BATCH_PRIMES = 1024
+
+# Timings, memory and search counters of a run, per stage ("generation", "analysis", "checkpoint", "write_...").
+# Events are passed to callback as dicts: {"event": "stage", ...} when a stage ends and {"event": "progress", ...}
+# at every progress step of the prime generation. callback is a function taking the event, or a logging.Logger,
+# which logs each event as JSON at INFO level. report() is written to metadata.json under "instrumentation".
+class RunInstrumentation:
+    def __init__(self, callback=None):
+        if isinstance(callback, logging.Logger):
+            logger = callback
+            callback = lambda event: logger.info("%s", json.dumps(event))
+        self.callback = callback
+        self.stages = {}
+        self.search = SearchStats()
+        self.primes_generated = 0
+        self.started = time.perf_counter()
+
+    def emit(self, event):
+        if self.callback is not None:
+            self.callback(event)
+
+    # Add the time since (wall_started, cpu_started) to a stage, without emitting an event. For steps taken many
+    # times over, such as analysing each batch of primes.
+    def record(self, name, wall_started, cpu_started):
+        stage = self.stages.setdefault(name, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_rss_kib": None})
+        stage["wall_seconds"] += time.perf_counter() - wall_started
+        stage["cpu_seconds"] += time.process_time() - cpu_started
+
+    # Time the block as part of a stage, without ending it.
+    @contextmanager
+    def timed(self, name):
+        wall_started, cpu_started = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.record(name, wall_started, cpu_started)
+
+    def end_stage(self, name):
+        stage = self.stages.setdefault(name, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_rss_kib": None})
+        stage["peak_rss_kib"] = peak_rss_kib()
+        self.emit({"event": "stage", "stage": name, **stage})
+
+    @contextmanager
+    def stage(self, name):
+        try:
+            with self.timed(name):
+                yield
+        finally:
+            self.end_stage(name)
+
+    # Yield the primes of a generate_prime_sequence iterator in lists of up to batch_size primes, timing each batch
+    # as the "generation" stage: the clocks are read once per batch rather than once per prime, which would cost
+    # a run of small primes about a quarter of its time. A batch never crosses a multiple of boundary primes, so
+    # that checkpoints taken between batches fall where they would prime by prime.
+    def timed_batches(self, primes, batch_size=TIMING_BATCH_PRIMES, boundary=None):
+        primes = iter(primes)
+        while True:
+            size = min(batch_size, boundary - self.primes_generated % boundary) if boundary else batch_size
+            with self.timed("generation"):
+                batch = list(islice(primes, size))
+            if not batch:
+                break
+            self.primes_generated += len(batch)
+            yield batch
+        self.end_stage("generation")
+
+    def primes_per_sec(self):
+        wall_seconds = self.stages.get("generation", {}).get("wall_seconds", 0.0)
+        return self.primes_generated / wall_seconds if wall_seconds > 0 else None
+
+    # Progress callback for generate_prime_sequence.
+    def progress(self, found, num_primes):
+        self.emit({"event": "progress", "primes": found, "num_primes": num_primes,
+                   "elapsed_seconds": time.perf_counter() - self.started, "primes_per_sec": self.primes_per_sec(),
+                   **self.search.as_dict()})
+
+    def report(self):
+        return {
+            "stages": self.stages,
+            "generation": {"primes": self.primes_generated, "primes_per_sec": self.primes_per_sec(),
+                           **self.search.as_dict()},
+            "total_wall_seconds": time.perf_counter() - self.started,
+            "peak_rss_kib": peak_rss_kib(),
+        }
+
+# The prime search options of generate_prime_sequence that a config sets, other than those drawn at random.
+def generation_options(config):
+    return {
+        # "miller_rabin" (default) or "bpsw"; both are exact below 3.3 * 10**24
+        "primality_test": config.get('primality_test', 'miller_rabin'),
+        # Candidate generation: "sequential" (default) or "sieve" (segmented sieve pre-filter before Miller-Rabin)
+        "prime_engine": config.get('prime_engine', 'sequential'),
+        "sieve_window": config.get('sieve_window', DEFAULT_SIEVE_WINDOW),
+        "sieve_prime_bound": config.get('sieve_prime_bound', DEFAULT_SIEVE_PRIME_BOUND),
+        # Parallel generation: the search is split into chunks of chunk_size integers spread over num_workers
+        "num_workers": config.get('num_workers', None),
+        "chunk_size": config.get('chunk_size', None),
+    }
+
+# Generate and analyse the primes described by config_file, writing the outputs it asks for.
+# callback receives the RunInstrumentation events (see there): a function taking each event, or a logging.Logger.
+# A config with extend_from continues an existing output directory instead (see extend_dataset).
+def run_from_config(config_file, callback=None):
+    instrumentation = RunInstrumentation(callback)
+    with open(config_file, 'r') as file:
+        config = json.load(file)
+
+    if config.get('extend_from'):
+        overrides = {key: value for key, value in config.items() if key not in ('extend_from', 'extend_by')}
+        return extend_dataset(config['extend_from'], config['extend_by'], overrides, callback)
+
+    # Resume an interrupted run from its last checkpoint, with the configuration it was started with
+    checkpoint = None
+    if config.get('resume_from'):
+        checkpoint = load_checkpoint(config['resume_from'])
+        config = checkpoint['config']
+        print(f"Resuming from {checkpoint['analysis'].num_primes} primes in {checkpoint['output_directory']}")
+        
+    # Set the random seed from the config file, if provided
+    random.seed(config.get('random_seed', None))
+
+    miller_rabin_iterations = config.get('miller_rabin_iterations', 5)  # Use 5 as the default
+
+    if checkpoint is not None:
+        start_number = checkpoint['start_number']
+    elif config['start_number'] == "random":
+        start_number = generate_random_number(config['num_bits'])
+    else:
+        start_number = config['start_number']
+
+    options = generation_options(config)
+    # The primality tests run on gmpy2 when it is installed ("auto"), or on "python" or "gmpy2"; same primes either way
+    use_arithmetic_backend(config.get('arithmetic_backend', 'auto'))
+    # Parallel generation seeds the witnesses of each chunk from random_seed and the chunk index. Without a
+    # random_seed, a base seed is drawn for this run.
+    random_seed = config.get('random_seed', None)
+    if options['num_workers'] and random_seed is None:
+        random_seed = random.getrandbits(64)
+    # Miller-Rabin witnesses come from their own generator, separate from the stream start_number is drawn from
+    witness_rng = random.Random(random.getrandbits(64))
+
+    # Without keep_sequences, only the tallies are kept in memory and the per-prime outputs are skipped
+    keep_sequences = config.get('keep_sequences', True)
+    prime_sets = config.get('prime_sets', [2, 4, 6, 8, 10, 12])
+    # Named prime sets are kept in memory ("pairs"), streamed to the output directory as they are found
+    # ("stream"), or only counted ("counts")
+    named_sets_storage = config.get('named_prime_sets_storage', 'pairs')
+    analysis_backend = config.get('analysis_backend', 'python')
+    # With low_memory, memory stays bounded by the number of distinct values whatever num_primes is: the gaps go to
+    # the state file as they are found, the primes table is written from it at the end, and the named prime sets
+    # are streamed (unless only counted). A StoredDataset reading the outputs back is returned.
+    low_memory = config.get('low_memory', False)
+    if low_memory:
+        if not config['write_output']:
+            raise ValueError("low_memory needs write_output: the dataset is kept in its output files")
+        keep_sequences = False
+        if analysis_backend != 'python':
+            print(f"Using the python analysis backend: the {analysis_backend} backend keeps every gap in memory.")
+            analysis_backend = 'python'
+        if named_sets_storage != 'counts':
+            named_sets_storage = 'stream'
+    if named_sets_storage == 'stream' and not config['write_output']:
+        print("Keeping the named prime sets in memory: streaming them needs write_output.")
+        named_sets_storage = 'pairs'
+    analysis = None
+    resume_after = None
+
+    if checkpoint is not None:
+        random_seed = checkpoint['random_seed']
+        random.setstate(checkpoint['random_state'])
+        witness_rng.setstate(checkpoint['witness_rng_state'])
+        analysis = checkpoint['analysis']
+        resume_after = analysis.last_prime
+    state_writer = checkpoint.get('state_writer') if checkpoint is not None else None
+
+    # With checkpoint_interval, the output directory is created up front and a checkpoint is written to it every
+    # checkpoint_interval primes. Streamed named prime sets are written to it too.
+    checkpoint_interval = config.get('checkpoint_interval', None)
+    output_directory = None
+    if checkpoint is not None:
+        output_directory = checkpoint['output_directory']
+    elif checkpoint_interval or named_sets_storage == 'stream' or low_memory:
+        output_directory = create_output_directory(config['num_bits'], config['num_primes'])
+        shutil.copy2(config_file, os.path.join(output_directory, "config.json"))
+
+    if analysis is None:
+        spill_prefix = None
+        if named_sets_storage == 'stream':
+            spill_prefix = os.path.join(output_directory,
+                                        f"{config['num_bits']}bit{config['num_primes']}_named_prime_sets")
+        # "python" updates the tallies prime by prime; "numpy" records the gaps and vectorizes the analysis at the
+        # end. prime_tuples are patterns of prime k-tuples, such as [0, 2, 6, 8], found along with the named sets.
+        analysis = create_analysis(prime_sets, keep_sequences, analysis_backend,
+                                   config.get('prime_tuples', []), named_sets_storage, spill_prefix)
+    if low_memory and state_writer is None and config.get('output_primes', True):
+        state_writer = CompactStateWriter(os.path.join(
+            output_directory, f"{config['num_bits']}bit{config['num_primes']}_state.pdx"))
+
+    # Primes are analysed as they are generated, in a single pass
+    print("Generating and analysing primes...")
+    primes_found = generate_prime_sequence(start_number, config['num_primes'] - analysis.num_primes,
+                                           miller_rabin_iterations, verbose=True, random_seed=random_seed,
+                                           rng=witness_rng, resume_after=resume_after,
+                                           stats=instrumentation.search, progress=instrumentation.progress,
+                                           **options)
+    for batch in instrumentation.timed_batches(primes_found, boundary=checkpoint_interval):
+        with instrumentation.timed("analysis"):
+            for prime in batch:
+                analysis.add(prime)
+                if state_writer is not None:
+                    state_writer.add(prime)
+        if checkpoint_interval and analysis.num_primes % checkpoint_interval == 0 \
+                and analysis.num_primes < config['num_primes']:
+            with instrumentation.stage("checkpoint"):
+                write_checkpoint(output_directory, {
+                    "config": config,
+                    "start_number": start_number,
+                    "random_seed": random_seed,
+                    "random_state": random.getstate(),
+                    "witness_rng_state": witness_rng.getstate(),
+                    "analysis": analysis,
+                    "state_writer": state_writer,
+                })
+    # Calculate number of digits which can be safely truncated for auto
+    num_digits = config.get('num_digits', None)
+    if num_digits is not None:
+        if num_digits == "auto":
+            num_digits = len(str(analysis.last_prime - analysis.first_prime)) + 2
+    #When num_digits is null in config, set to 10. 
+    else: num_digits = 10   
+    with instrumentation.stage("analysis"):
+        analysis.finish()
+        primes = analysis.primes
+        second_differences = analysis.second_differences
+        second_ratios = analysis.second_ratios
+        sd_sr_combinations = analysis.sd_sr_combinations()
+        named_prime_sets = analysis.named_prime_sets(num_digits)
+    print("Done!")
+    
+    if config['write_output']:
+        if output_directory is None:
+            output_directory = create_output_directory(config['num_bits'], config['num_primes'])
+            # Copy the configuration file to the output directory
+            shutil.copy2(config_file, os.path.join(output_directory, "config.json"))
+        print(f"Full path to the output directory: {os.path.abspath(output_directory)}")
+        print(f"Current working directory: {os.getcwd()}")
+
+        base_filename = os.path.join(output_directory, f"{config['num_bits']}bit{config['num_primes']}")
+        # CSV outputs may be compressed: None (default), "gzip" (.csv.gz) or "zstd" (.csv.zst)
+        compression = config.get('output_compression', None)
+        # The primes table can be written as "csv" (default), "parquet" or "arrow" instead
+        primes_output_format = config.get('primes_output_format', 'csv')
+
+        if config.get('output_primes', True):
+            if low_memory:
+                # The primes table is written from the state file, whose gaps are all written by now
+                with instrumentation.stage("write_state"):
+                    state_writer.close()
+                if config.get('state_format', 'compact') == 'pickle':
+                    print("Writing the compact state file: the pickle state format needs the sequences in memory.")
+                with instrumentation.stage("write_primes"), load_state_file(state_writer.filename) as state:
+                    write_prime_rows(state.iter_rows(num_digits), base_filename, primes_output_format,
+                                     compression)
+            elif keep_sequences:
+                with instrumentation.stage("write_primes"):
+                    if primes_output_format == 'csv':
+                        write_primes_to_csv(primes, second_differences, second_ratios, base_filename, num_digits,
+                                            compression)
+                    else:
+                        write_primes_columnar(primes, second_differences, second_ratios, base_filename,
+                                              num_digits, primes_output_format)
+                # "compact" (default) gap-encoded _state.pdx, or "pickle" for the gzip pickle _state.pkl.gz
+                with instrumentation.stage("write_state"):
+                    if config.get('state_format', 'compact') == 'pickle':
+                        write_state_to_pickle(primes, second_differences, second_ratios, base_filename)
+                    else:
+                        write_state_file(primes, base_filename)
+            else:
+                print("Skipping the primes output: it needs keep_sequences.")
+        if config.get('output_second_differences', True):
+            with instrumentation.stage("write_second_differences"):
+                write_second_differences_to_csv(analysis.sd_counter, base_filename, compression)
+        if config.get('output_second_ratios', True):
+            with instrumentation.stage("write_second_ratios"):
+                write_second_ratios_to_csv(analysis.sr_counts(), base_filename, compression)
+        if config.get('output_sd_sr_combinations', True):
+            with instrumentation.stage("write_sd_sr_combinations"):
+                write_sd_sr_combinations_to_csv(sd_sr_combinations, base_filename, compression)
+        if config.get('output_named_prime_sets', True):
+            if analysis.named_sets.storage != 'counts':
+                with instrumentation.stage("write_named_prime_sets"):
+                    write_named_prime_sets_to_csv(named_prime_sets, base_filename, compression)
+            else:
+                print("Skipping the named prime sets output: only their totals are counted.")
+        if config.get('output_named_prime_sets_totals', True):
+            with instrumentation.stage("write_named_prime_sets_totals"):
+                write_named_prime_sets_totals_to_csv(named_prime_sets, base_filename, compression)
+
+        # Write metadata file, last so that it holds the timings of every other stage
+        write_metadata_file(output_directory, analysis.first_prime, analysis.last_prime, config['num_bits'],
+                            config['num_primes'], num_digits, instrumentation.report())
+        # Add the dataset to the distribution store, if the config names one
+        ingest_into_distribution_store(config, output_directory)
+
+    # Streamed named prime sets are returned as their totals once written
+    if analysis.named_sets.storage == 'stream':
+        analysis.named_sets.remove_spill_files()
+        named_prime_sets = analysis.named_sets.totals()
+
+    # The run is complete, so its checkpoint is no longer needed
+    if output_directory is not None and os.path.exists(os.path.join(output_directory, CHECKPOINT_FILENAME)):
+        os.remove(os.path.join(output_directory, CHECKPOINT_FILENAME))
+
+    if low_memory:
+        return StoredDataset(output_directory)
+    return primes, second_differences, second_ratios, sd_sr_combinations, named_prime_sets
+
+
+# Read an aggregated output CSV (second differences, second ratios or SD-SR combinations) back into a Counter, in
+# file order. The key is made of the columns before Count, converted with key_types (a single column on its own).
+def read_counts_csv(filename, *key_types):
+    counts = Counter()
+    with open_input_file(filename) as file:
+        reader = csv.reader(file)
+        next(reader)  # Header
+        for row in reader:
+            key = tuple(key_type(value) for key_type, value in zip(key_types, row))
+            counts[key if len(key) > 1 else key[0]] = int(row[len(key_types)])
+    return counts
+
+# Add new counts to those of an existing output, keeping the existing keys first.
+def merge_counts(existing_counts, new_counts):
+    merged = Counter(existing_counts)
+    merged.update(new_counts)
+    return merged
+
+# The rows of the named prime sets output with the new pairs of named_prime_sets after the existing rows of the
+# same name, read from existing_filename a name at a time.
+def merged_named_prime_set_rows(existing_filename, named_prime_sets):
+    names_done = set()
+    with open_input_file(existing_filename) as file:
+        reader = csv.reader(file)
+        next(reader)  # Header
+        for name, rows in groupby(reader, key=itemgetter(0)):
+            yield from rows
+            yield from ((name, prime_set) for prime_set in named_prime_sets.get(name, ()))
+            names_done.add(name)
+    for name, prime_set_list in named_prime_sets.items():
+        if name not in names_done:
+            yield from ((name, prime_set) for prime_set in prime_set_list)
+
+# A dataset written to output_directory, read back from disk on demand: the per-prime sequences are iterated from
+# its compact state file, and the distributions and named prime sets are read from its CSV outputs when asked for.
+# run_from_config returns one with low_memory. It unpacks like the outputs of run_from_config, as iterators of
+# the primes, second differences and second ratios, the SD-SR combinations and the named prime set totals.
+class StoredDataset:
+    def __init__(self, output_directory):
+        self.output_directory = output_directory
+        self.prefix = os.path.basename(os.path.normpath(output_directory)).split("_")[0]
+        with open(os.path.join(output_directory, "metadata.json"), 'r') as file:
+            self.metadata = json.load(file)
+
+    # The path of the output name (such as "sd") in the first of the given formats that exists. A missing output
+    # raises FileNotFoundError, or gives None if not required.
+    def output_path(self, name, suffixes=CSV_OUTPUT_SUFFIXES, required=True):
+        filename = find_output_file(self.output_directory, f"{self.prefix}_{name}", suffixes)
+        if filename is None:
+            if not required:
+                return None
+            raise FileNotFoundError(f"{self.output_directory} has no {name} output")
+        return os.path.join(self.output_directory, filename)
+
+    # Iterate one of the sequences of the state file, which is open while the iteration lasts.
+    def _iter_state(self, method, *arguments):
+        with load_state_file(self.output_path("state", ('.pdx',))) as state:
+            yield from getattr(state, method)(*arguments)
+
+    def primes(self):
+        return self._iter_state("iter_primes")
+
+    def second_differences(self):
+        return self._iter_state("iter_second_differences")
+
+    def second_ratios(self):
+        return self._iter_state("iter_second_ratios")
+
+    # The rows of the primes output, truncated to the dataset's num_digits.
+    def rows(self):
+        return self._iter_state("iter_rows", self.metadata['num_digits'])
+
+    # The SD and SR distributions, or None if the run did not write them (output_sd or output_sr false).
+    def sd_counts(self):
+        filename = self.output_path("sd", required=False)
+        return read_counts_csv(filename, int) if filename is not None else None
+
+    def sr_counts(self):
+        filename = self.output_path("sr", required=False)
+        return read_counts_csv(filename, str) if filename is not None else None
+
+    # Counter of (second difference, second ratio) pairs, as run_from_config returns it, or None if the run did not
+    # write them (output_sd_sr_combinations false).
+    def sd_sr_combinations(self):
+        filename = self.output_path("sd_sr_combinations", required=False)
+        if filename is None:
+            return None
+        return Counter({(sd, Fraction(sr) if sr not in ("", "None") else None): count
+                        for (sd, sr), count in read_counts_csv(filename, int, str).items()})
+
+    # The named prime set totals, or None if the run did not write them (output_named_prime_sets_totals false).
+    def named_prime_sets_totals(self):
+        filename = self.output_path("named_prime_sets_totals", required=False)
+        if filename is None:
+            return None
+        return dict(read_counts_csv(filename, str))
+
+    # Yield the named prime sets as (name, tuple of truncated primes), in file order.
+    def iter_named_prime_sets(self):
+        with open_input_file(self.output_path("named_prime_sets")) as file:
+            reader = csv.reader(file)
+            next(reader)  # Header
+            for name, prime_set in reader:
+                yield name, ast.literal_eval(prime_set)
+
+    def __iter__(self):
+        return iter((self.primes(), self.second_differences(), self.second_ratios(), self.sd_sr_combinations(),
+                     self.named_prime_sets_totals()))
+
+    def __repr__(self):
+        return f"StoredDataset({self.output_directory!r})"
+
+# Continue the dataset in output directory by num_primes more primes, generated from its last prime on, and bring
+# every output it has up to date: the primes table and state file grow by the new rows, and the distributions,
+# SD-SR combinations and named prime set totals have the new counts added to theirs, so the cost is that of the new
+# primes only. overrides replaces values of the directory's config.json for the search (engine, workers, seed...);
+# the dataset's prime_sets and num_digits are kept. metadata.json and the num_primes of config.json are updated.
+# callback is as for run_from_config. Returns the outputs of run_from_config for the new primes.
+def extend_dataset(directory, num_primes, overrides=None, callback=None):
+    instrumentation = RunInstrumentation(callback)
+    with open(os.path.join(directory, "config.json"), 'r') as file:
+        dataset_config = json.load(file)
+    with open(os.path.join(directory, "metadata.json"), 'r') as file:
+        metadata = json.load(file)
+    config = {**dataset_config, **(overrides or {})}
+    prime_sets = dataset_config.get('prime_sets', [2, 4, 6, 8, 10, 12])
+    prime_tuples = dataset_config.get('prime_tuples', [])
+    # The new matches are few enough to keep in memory, unless the dataset only counts them
+    named_sets_storage = 'counts' if dataset_config.get('named_prime_sets_storage') == 'counts' else 'pairs'
+    num_digits = metadata['num_digits']
+    last_prime = metadata['last_prime']
+    prefix = os.path.basename(os.path.normpath(directory)).split("_")[0]
+    base_filename = os.path.join(directory, prefix)
+    output_files = {name: find_output_file(directory, f"{prefix}_{name}")
+                    for name in ("sd", "sr", "sd_sr_combinations", "named_prime_sets", "named_prime_sets_totals")}
+    output_files["primes"] = find_output_file(directory, f"{prefix}_primes",
+                                              CSV_OUTPUT_SUFFIXES + ('.parquet', '.arrow'))
+    output_files["state"] = find_output_file(directory, f"{prefix}_state", ('.pdx', '.pkl.gz'))
+    # The per-prime outputs can only be extended with the new primes kept in memory
+    keep_sequences = output_files["primes"] is not None or output_files["state"] is not None
+
+    random.seed(config.get('random_seed', None))
+    miller_rabin_iterations = config.get('miller_rabin_iterations', 5)
+    options = generation_options(config)
+    use_arithmetic_backend(config.get('arithmetic_backend', 'auto'))
+    random_seed = config.get('random_seed', None)
+    if options['num_workers'] and random_seed is None:
+        random_seed = random.getrandbits(64)
+    witness_rng = random.Random(random.getrandbits(64))
+
+    analysis = create_analysis(prime_sets, keep_sequences, config.get('analysis_backend', 'python'), prime_tuples,
+                               named_sets_storage)
+    # The second differences of the first new primes need the last two primes of the dataset, and the named sets
+    # one less than their longest pattern
+    tail_length = min(max(2, analysis.named_sets.context_length), metadata['num_primes'])
+    old_state = None  # A pickle state is rewritten whole, so it is loaded whole
+    if output_files["state"] is not None and output_files["state"].endswith('.pkl.gz'):
+        old_state = load_pickle_file(os.path.join(directory, output_files["state"]))
+    if old_state is not None:
+        tail = old_state[0][-tail_length:]
+    elif output_files["state"] is not None:
+        with load_state_file(os.path.join(directory, output_files["state"])) as state:
+            tail_gaps = state.gaps[len(state.gaps) - tail_length + 1:].tolist()
+            tail = list(accumulate(tail_gaps, initial=last_prime - sum(tail_gaps)))
+    else:
+        tail = [last_prime]
+        while len(tail) < tail_length:
+            tail.insert(0, find_previous_prime(tail[0], miller_rabin_iterations, witness_rng,
+                                               options['primality_test']))
+    analysis.continue_after(tail)
+    tail = tail[-2:]  # The primes and state outputs continue after the last two
+    print(f"Extending {metadata['num_primes']} primes by {num_primes}...")
+    primes_found = generate_prime_sequence(last_prime, num_primes, miller_rabin_iterations, verbose=True,
+                                           random_seed=random_seed, rng=witness_rng, resume_after=last_prime,
+                                           stats=instrumentation.search, progress=instrumentation.progress,
+                                           **options)
+    for batch in instrumentation.timed_batches(primes_found):
+        with instrumentation.timed("analysis"):
+            for prime in batch:
+                analysis.add(prime)
+    with instrumentation.stage("analysis"):
+        analysis.finish()
+        primes = analysis.primes
+        second_differences = analysis.second_differences
+        second_ratios = analysis.second_ratios
+        sd_sr_combinations = analysis.sd_sr_combinations()
+        named_prime_sets = analysis.named_prime_sets(num_digits)
+    print("Done!")
+
+    def output_path(name):
+        return os.path.join(directory, output_files[name])
+
+    def rewrite_csv(name, write, counts):
+        # The write functions add the compression suffix to the uncompressed name they are given
+        compression = output_compression_of(output_files[name])
+        write(counts, base_filename, compression)
+
+    if output_files["primes"] is not None:
+        with instrumentation.stage("write_primes"):
+            primes_format = output_files["primes"].rsplit(".", 1)[-1]
+            if primes_format in ('parquet', 'arrow'):
+                write_primes_columnar(primes, second_differences, second_ratios, base_filename, num_digits,
+                                      primes_format, append=True)
+            else:
+                write_primes_to_csv(primes, second_differences, second_ratios, base_filename, num_digits,
+                                    output_compression_of(output_files["primes"]), append=True)
+    if output_files["state"] is not None:
+        with instrumentation.stage("write_state"):
+            new_gaps = [b - a for a, b in zip(primes[len(tail) - 1:-1], primes[len(tail):])]
+            if old_state is None:
+                append_state_gaps(output_path("state"), new_gaps)
+            else:
+                old_primes, old_sd, old_sr = old_state
+                if isinstance(old_sr, RatioArray):
+                    old_sr.numerators.extend(second_ratios.numerators)
+                    old_sr.denominators.extend(second_ratios.denominators)
+                else:
+                    old_sr = list(old_sr) + list(second_ratios)
+                write_state_to_pickle(old_primes + primes[len(tail):], old_sd + second_differences, old_sr,
+                                      base_filename)
+    if output_files["sd"] is not None:
+        with instrumentation.stage("write_second_differences"):
+            rewrite_csv("sd", write_second_differences_to_csv,
+                        merge_counts(read_counts_csv(output_path("sd"), int), analysis.sd_counter))
+    if output_files["sr"] is not None:
+        with instrumentation.stage("write_second_ratios"):
+            rewrite_csv("sr", write_second_ratios_to_csv,
+                        merge_counts(read_counts_csv(output_path("sr"), str), analysis.sr_counts()))
+    if output_files["sd_sr_combinations"] is not None:
+        with instrumentation.stage("write_sd_sr_combinations"):
+            new_combinations = Counter({(sd, str(sr)): count for (sd, sr), count in sd_sr_combinations.items()})
+            rewrite_csv("sd_sr_combinations", write_sd_sr_combinations_to_csv,
+                        merge_counts(read_counts_csv(output_path("sd_sr_combinations"), int, str),
+                                     new_combinations))
+    if output_files["named_prime_sets"] is not None:
+        with instrumentation.stage("write_named_prime_sets"):
+            # Written next to the existing file, which it replaces once complete
+            compression = output_compression_of(output_files["named_prime_sets"])
+            temporary_filename = f"{base_filename}_named_prime_sets.tmp.csv"
+            write_csv_rows(temporary_filename, ["Name", "Prime Set"],
+                           merged_named_prime_set_rows(output_path("named_prime_sets"), named_prime_sets),
+                           compression)
+            os.replace(temporary_filename + OUTPUT_COMPRESSION_SUFFIXES[compression], output_path("named_prime_sets"))
+    if output_files["named_prime_sets_totals"] is not None:
+        with instrumentation.stage("write_named_prime_sets_totals"):
+            totals = merge_counts(read_counts_csv(output_path("named_prime_sets_totals"), str),
+                                  {name: named_set_total(matches) for name, matches in named_prime_sets.items()})
+            write_csv_rows(f"{base_filename}_named_prime_sets_totals.csv", ["Name", "Total"], totals.items(),
+                           output_compression_of(output_files["named_prime_sets_totals"]))
+
+    total_primes = metadata['num_primes'] + analysis.num_primes
+    dataset_config['num_primes'] = total_primes
+    with open(os.path.join(directory, "config.json"), 'w') as file:
+        json.dump(dataset_config, file, indent=4)
+    write_metadata_file(directory, metadata['first_prime'], analysis.last_prime, metadata['num_bits'], total_primes,
+                        num_digits, instrumentation.report())
+    ingest_into_distribution_store(config, directory)
+    return primes, second_differences, second_ratios, sd_sr_combinations, named_prime_sets
+
+
+# The run configurations of a sweep: every entry of sweep["runs"] (a list of config overrides, by default a single
+# empty one) combined with every point of sweep["grid"] (a dict of config keys to lists of values), each applied on
+# top of sweep["base"] (a config dict, or the path of a config file). Returns a list of (overrides, config).
+def sweep_configs(sweep):
+    base = sweep.get('base', {})
+    if isinstance(base, str):
+        with open(base, 'r') as file:
+            base = json.load(file)
+    grid = sweep.get('grid', {})
+    grid_points = [dict(zip(grid, values)) for values in product(*grid.values())]
+    return [({**run, **point}, {**base, **run, **point})
+            for run in sweep.get('runs', [{}]) for point in grid_points]
+
+# Run one configuration of a sweep in a worker process: in run_directory, which receives its output directory and
+# a run.log of what the run prints. Returns a summary of the run with its SD and SR counts, which are taken from
+# the SD-SR combinations so that they are there whatever the config writes or keeps. A low_memory run returns a
+# StoredDataset instead, whose counts are read from its _sd and _sr outputs, as its SD-SR combinations and named
+# prime set totals are None when not written; totals that were not written are left empty.
+def _run_sweep_config(config_file, run_directory):
+    os.makedirs(run_directory, exist_ok=True)
+    os.chdir(run_directory)
+    started = time.perf_counter()
+    with open("run.log", 'w') as log, redirect_stdout(log):
+        result = run_from_config(config_file)
+    _, _, _, sd_sr_combinations, named_prime_sets = result
+    sd_counts = sr_counts = None
+    if isinstance(result, StoredDataset):
+        sd_counts, sr_counts = result.sd_counts(), result.sr_counts()
+    if sd_counts is None or sr_counts is None:
+        sd_counts, sr_counts = Counter(), Counter()
+        for (sd, sr), count in (sd_sr_combinations or {}).items():
+            sd_counts[sd] += count
+            sr_counts[format_ratio(sr.numerator, sr.denominator) if sr is not None else ""] += count
+    output_directories = [entry.path for entry in os.scandir(run_directory) if entry.is_dir()]
+    metadata = {}
+    if output_directories:
+        with open(os.path.join(output_directories[0], "metadata.json"), 'r') as file:
+            metadata = json.load(file)
+    return {
+        "output_directory": output_directories[0] if output_directories else None,
+        "first_prime": metadata.get("first_prime"),
+        "last_prime": metadata.get("last_prime"),
+        "num_digits": metadata.get("num_digits"),
+        "named_prime_sets_totals": {name: named_set_total(matches)
+                                    for name, matches in (named_prime_sets or {}).items()},
+        "wall_seconds": time.perf_counter() - started,
+        "sd_counts": sd_counts,
+        "sr_counts": sr_counts,
+    }
+
+# Run every configuration of the sweep described by sweep_file (see sweep_configs) on a pool of num_workers
+# processes (sweep["num_workers"], by default one per CPU). The workers start with the small prime tables the runs
+# need, built once here. Each run gets its config file (run_000.json, ...) and a directory (run_000/, ...) holding
+# its output directory in the sweep directory, sweep["output_directory"] or sweep_<timestamp>. A run that fails
+# is reported and the others go on. The sweep directory also receives the combined summary tables:
+#   sweep_runs.csv: one row per run, with its overrides, first and last prime, named prime set totals and time
+#   sweep_sd.csv, sweep_sr.csv: the SD and SR distributions of every run, one row per run and value
+# Returns the run summaries.
+def run_sweep(sweep_file, num_workers=None):
+    with open(sweep_file, 'r') as file:
+        sweep = json.load(file)
+    runs = sweep_configs(sweep)
+    num_workers = num_workers or sweep.get('num_workers') or os.cpu_count()
+    sweep_directory = os.path.abspath(sweep.get('output_directory')
+                                      or f"sweep_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    os.makedirs(sweep_directory, exist_ok=True)
+
+    # Built once for the whole sweep and handed to every worker
+    small_primes_tables = {997: small_primes_up_to(997)}
+    for _, config in runs:
+        if config.get('prime_engine', 'sequential') == 'sieve':
+            bound = config.get('sieve_prime_bound', DEFAULT_SIEVE_PRIME_BOUND)
+            small_primes_tables[bound] = small_primes_up_to(bound)
+
+    summaries = []
+    print(f"Running {len(runs)} configurations on {num_workers} workers in {sweep_directory}")
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=install_small_primes,
+                             initargs=(small_primes_tables,)) as executor:
+        futures = []
+        for index, (overrides, config) in enumerate(runs):
+            run_name = f"run_{index:03d}"
+            config_file = os.path.join(sweep_directory, f"{run_name}.json")
+            with open(config_file, 'w') as file:
+                json.dump(config, file, indent=4)
+            futures.append(executor.submit(_run_sweep_config, config_file, os.path.join(sweep_directory, run_name)))
+            summaries.append({"run": run_name, "overrides": overrides, "num_bits": config.get('num_bits'),
+                              "num_primes": config.get('num_primes')})
+        for summary, future in zip(summaries, futures):
+            try:
+                summary.update(future.result())
+                print(f"{summary['run']} done in {summary['wall_seconds']:.1f} s")
+            except Exception as error:
+                summary["error"] = repr(error)
+                print(f"{summary['run']} failed: {summary['error']}")
+
+    prime_set_names = list(dict.fromkeys(name for summary in summaries
+                                         for name in summary.get("named_prime_sets_totals", {})))
+    write_csv_rows(os.path.join(sweep_directory, "sweep_runs.csv"),
+                   ["Run", "Overrides", "Num Bits", "Num Primes", "First Prime", "Last Prime", "Num Digits",
+                    "Distinct Second Differences", "Distinct Second Ratios", *prime_set_names, "Wall Seconds",
+                    "Output Directory", "Error"],
+                   ((summary["run"], json.dumps(summary["overrides"]), summary["num_bits"], summary["num_primes"],
+                     summary.get("first_prime"), summary.get("last_prime"), summary.get("num_digits"),
+                     len(summary.get("sd_counts", ())), len(summary.get("sr_counts", ())),
+                     *(summary.get("named_prime_sets_totals", {}).get(name) for name in prime_set_names),
+                     summary.get("wall_seconds"), summary.get("output_directory"), summary.get("error"))
+                    for summary in summaries))
+    for name, header, counts_key in (("sweep_sd.csv", "Second Difference", "sd_counts"),
+                                     ("sweep_sr.csv", "Second Ratio", "sr_counts")):
+        write_csv_rows(os.path.join(sweep_directory, name), ["Run", header, "Count", "Percentage"],
+                       ((summary["run"], value, count, 100 * count / sum(summary[counts_key].values()))
+                        for summary in summaries if counts_key in summary
+                        for value, count in summary[counts_key].most_common()))
+    return summaries
+
+
+# SQLite store of the distributions of many datasets, for queries across them without re-reading their CSVs.
+# Per dataset (output directory) it keeps the metadata.json fields and config, and the SD, SR and SD-SR counts,
+# with indexes by value and bit size. ingest() is incremental: a dataset is only read again once its metadata.json
+# has changed (as it does when the dataset is extended). Second ratios are keyed by their strings in _sr.csv
+# ("1/2", "-1/3", "0"); the query methods also take them as Fractions or anything else Fraction() parses.
+class DistributionStore:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS datasets (
+            id INTEGER PRIMARY KEY, directory TEXT UNIQUE NOT NULL, metadata_mtime REAL NOT NULL,
+            num_bits INTEGER, num_primes INTEGER, num_digits INTEGER, first_prime TEXT, last_prime TEXT,
+            left_digits TEXT, num_second_differences INTEGER, config TEXT);
+        CREATE INDEX IF NOT EXISTS datasets_num_bits ON datasets (num_bits);
+        CREATE TABLE IF NOT EXISTS sd_counts (
+            dataset_id INTEGER NOT NULL, sd INTEGER NOT NULL, count INTEGER NOT NULL,
+            PRIMARY KEY (dataset_id, sd)) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS sd_counts_sd ON sd_counts (sd, dataset_id);
+        CREATE TABLE IF NOT EXISTS sr_counts (
+            dataset_id INTEGER NOT NULL, sr TEXT NOT NULL, count INTEGER NOT NULL,
+            PRIMARY KEY (dataset_id, sr)) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS sr_counts_sr ON sr_counts (sr, dataset_id);
+        CREATE TABLE IF NOT EXISTS sd_sr_counts (
+            dataset_id INTEGER NOT NULL, sd INTEGER NOT NULL, sr TEXT NOT NULL, count INTEGER NOT NULL,
+            PRIMARY KEY (dataset_id, sd, sr)) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS sd_sr_counts_sd_sr ON sd_sr_counts (sd, sr, dataset_id);
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        # Runs of a sweep may ingest into the same store at once: wait for each other's writes
+        self.connection = sqlite3.connect(filename, timeout=60)
+        self.connection.executescript(self.SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Add or refresh the dataset in output directory. Returns False if it was already stored unchanged.
+    def ingest(self, directory):
+        directory = os.path.abspath(directory)
+        metadata_filename = os.path.join(directory, "metadata.json")
+        metadata_mtime = os.path.getmtime(metadata_filename)
+        row = self.connection.execute("SELECT id, metadata_mtime FROM datasets WHERE directory = ?",
+                                      (directory,)).fetchone()
+        if row is not None and row[1] == metadata_mtime:
+            return False
+        with open(metadata_filename, 'r') as file:
+            metadata = json.load(file)
+        config = None
+        if os.path.isfile(os.path.join(directory, "config.json")):
+            with open(os.path.join(directory, "config.json"), 'r') as file:
+                config = file.read()
+
+        # The counts come from the SD-SR combinations when written, else from the SD and SR tables
+        prefix = os.path.basename(directory).split("_")[0]
+        sd_sr_file, sd_file, sr_file = (find_output_file(directory, f"{prefix}_{name}")
+                                        for name in ("sd_sr_combinations", "sd", "sr"))
+        sd_sr_counts = read_counts_csv(os.path.join(directory, sd_sr_file), int, str) if sd_sr_file else Counter()
+        if sd_file:
+            sd_counts = read_counts_csv(os.path.join(directory, sd_file), int)
+        else:
+            sd_counts = Counter()
+            for (sd, _), count in sd_sr_counts.items():
+                sd_counts[sd] += count
+        # Written as str(Fraction) there, which can differ from _sr.csv ("None" for no ratio)
+        sd_sr_counts = Counter({(sd, ratio_key(sr)): count for (sd, sr), count in sd_sr_counts.items()})
+        if sr_file:
+            sr_counts = read_counts_csv(os.path.join(directory, sr_file), str)
+        else:
+            sr_counts = Counter()
+            for (_, sr), count in sd_sr_counts.items():
+                sr_counts[sr] += count
+
+        with self.connection:
+            if row is not None:
+                self._delete(row[0])
+            dataset_id = self.connection.execute(
+                "INSERT INTO datasets (directory, metadata_mtime, num_bits, num_primes, num_digits, first_prime, "
+                "last_prime, left_digits, num_second_differences, config) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (directory, metadata_mtime, metadata.get("num_bits"), metadata.get("num_primes"),
+                 metadata.get("num_digits"), str(metadata.get("first_prime")), str(metadata.get("last_prime")),
+                 metadata.get("left_digits"), sum(sd_counts.values()), config)).lastrowid
+            self.connection.executemany("INSERT INTO sd_counts VALUES (?, ?, ?)",
+                                        ((dataset_id, sd, count) for sd, count in sd_counts.items()))
+            self.connection.executemany("INSERT INTO sr_counts VALUES (?, ?, ?)",
+                                        ((dataset_id, sr, count) for sr, count in sr_counts.items()))
+            self.connection.executemany("INSERT INTO sd_sr_counts VALUES (?, ?, ?, ?)",
+                                        ((dataset_id, sd, sr, count) for (sd, sr), count in sd_sr_counts.items()))
+        return True
+
+    # Ingest every output directory (a directory holding a metadata.json) under root. Returns how many were new or
+    # changed.
+    def ingest_all(self, root):
+        return sum(self.ingest(path) for path, _, filenames in os.walk(root) if "metadata.json" in filenames)
+
+    # Remove the datasets whose output directories no longer exist. Returns how many were removed.
+    def prune(self):
+        datasets = self.connection.execute("SELECT id, directory FROM datasets").fetchall()
+        missing = [dataset_id for dataset_id, directory in datasets if not os.path.isdir(directory)]
+        with self.connection:
+            for dataset_id in missing:
+                self._delete(dataset_id)
+        return len(missing)
+
+    def _delete(self, dataset_id):
+        for table in ("sd_counts", "sr_counts", "sd_sr_counts"):
+            self.connection.execute(f"DELETE FROM {table} WHERE dataset_id = ?", (dataset_id,))
+        self.connection.execute("DELETE FROM datasets WHERE id = ?", (dataset_id,))
+
+    # The stored datasets as dicts of their metadata (and directory), optionally only those of num_bits.
+    def datasets(self, num_bits=None):
+        cursor = self.connection.execute(
+            "SELECT directory, num_bits, num_primes, num_digits, first_prime, last_prime, num_second_differences "
+            "FROM datasets WHERE ?1 IS NULL OR num_bits = ?1 ORDER BY num_bits, directory", (num_bits,))
+        names = [column[0] for column in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    # Count and frequency (a fraction of all second ratios) of the second ratio sr over the datasets, optionally
+    # only those of num_bits: a dict of count, total and frequency, or with per_dataset, a list of such dicts with
+    # the directory and num_bits of each dataset.
+    def sr_frequency(self, sr, num_bits=None, per_dataset=False):
+        return self._frequency("sr_counts", "sr = ?", (ratio_key(sr),), num_bits, per_dataset)
+
+    # The same for the second difference sd.
+    def sd_frequency(self, sd, num_bits=None, per_dataset=False):
+        return self._frequency("sd_counts", "sd = ?", (sd,), num_bits, per_dataset)
+
+    # The same for the combination of second difference sd and second ratio sr.
+    def sd_sr_frequency(self, sd, sr, num_bits=None, per_dataset=False):
+        return self._frequency("sd_sr_counts", "sd = ? AND sr = ?", (sd, ratio_key(sr)), num_bits, per_dataset)
+
+    def _frequency(self, table, condition, values, num_bits, per_dataset):
+        rows = self.connection.execute(
+            f"SELECT d.directory, d.num_bits, COALESCE(c.count, 0), d.num_second_differences FROM datasets d "
+            f"LEFT JOIN {table} c ON c.dataset_id = d.id AND {condition} "
+            f"WHERE ? IS NULL OR d.num_bits = ? ORDER BY d.num_bits, d.directory",
+            (*values, num_bits, num_bits)).fetchall()
+        if per_dataset:
+            return [{"directory": directory, "num_bits": bits, "count": count, "total": total,
+                     "frequency": count / total if total else None} for directory, bits, count, total in rows]
+        count, total = sum(row[2] for row in rows), sum(row[3] for row in rows)
+        return {"count": count, "total": total, "frequency": count / total if total else None}
+
+    # The k most frequent second differences per bit size, summed over the datasets of that size:
+    # {num_bits: [(sd, count, frequency), ...]}, optionally only for num_bits.
+    def top_sd(self, k=10, num_bits=None):
+        return self._top("sd_counts", "sd", k, num_bits)
+
+    # The k most frequent second ratios per bit size, as top_sd.
+    def top_sr(self, k=10, num_bits=None):
+        return self._top("sr_counts", "sr", k, num_bits)
+
+    def _top(self, table, column, k, num_bits):
+        rows = self.connection.execute(
+            f"WITH totals AS (SELECT d.num_bits, c.{column} AS value, SUM(c.count) AS count FROM {table} c "
+            f"JOIN datasets d ON d.id = c.dataset_id WHERE ?1 IS NULL OR d.num_bits = ?1 "
+            f"GROUP BY d.num_bits, c.{column}), "
+            f"sizes AS (SELECT num_bits, SUM(num_second_differences) AS total FROM datasets GROUP BY num_bits) "
+            f"SELECT num_bits, value, count, total FROM (SELECT t.*, s.total, ROW_NUMBER() OVER "
+            f"(PARTITION BY t.num_bits ORDER BY t.count DESC, t.value) AS rank FROM totals t "
+            f"JOIN sizes s USING (num_bits)) WHERE rank <= ?2 ORDER BY num_bits, rank", (num_bits, k))
+        top = {}
+        for bits, value, count, total in rows:
+            top.setdefault(bits, []).append((value, count, count / total if total else None))
+        return top
+
+    # Run any SQL query on the store, returning the rows.
+    def query(self, sql, parameters=()):
+        return self.connection.execute(sql, parameters).fetchall()
+
+# The key of a second ratio in the distribution store: its string as written to _sr.csv ("" for no ratio).
+def ratio_key(sr):
+    if sr is None or sr in ("", "None"):
+        return ""
+    return format_ratio(*Fraction(sr).as_integer_ratio())
+
+# Ingest an output directory into the distribution store of a run's config, if it names one.
+def ingest_into_distribution_store(config, output_directory):
+    if config.get('distribution_store'):
+        with DistributionStore(config['distribution_store']) as store:
+            store.ingest(output_directory)
@@ -0,0 +1,393 @@
+'''
+Animation and Visualization Functions
+
+Loaded the first time one of them is used from the primediffex package, so that the generation and analysis core
+starts without matplotlib, pandas and tqdm.
+'''
+
+import warnings
+import json
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+import numpy as np
+from matplotlib import patches
+import matplotlib.pyplot as plt
+import pandas as pd
+from tqdm import tqdm
+
+from .core import (CSV_OUTPUT_SUFFIXES, MAX_RATIO_DENOMINATOR, find_output_file, format_ratio, is_compact_state_file,
+                   load_state_file, second_ratios_from_gaps)
+
+def parse_ratio(ratio_str):
+    """Parse a ratio string (like '3/2') into a float."""
+    try:
+        return float(Fraction(ratio_str))
+    except (ZeroDivisionError, ValueError):
+        return 0
+
+def create_ranked_data(data):
+    """Create ranked data for Second Difference and Second Ratio."""
+    data['SD Rank'] = data['Second Difference'].rank(ascending=False)
+    data['SR Rank'] = data['Second Ratio (Decimal)'].rank(ascending=False)
+    return data
+
+
+def ratio_decimals(ratio_strings):
+    """Decimal values of a Series of ratio strings ('3/2', '-1', '0'), parsed with vectorized string splitting.
+
+    Gives the same values as parse_ratio, including 0 for ratios that cannot be parsed or divide by zero.
+    """
+    parts = ratio_strings.astype(str).str.split('/', n=1, expand=True)
+    numerators = pd.to_numeric(parts[0], errors='coerce')
+    if parts.shape[1] > 1:
+        denominators = pd.to_numeric(parts[1], errors='coerce').fillna(1)
+    else:
+        denominators = 1
+    decimals = numerators / denominators
+    return decimals.replace([np.inf, -np.inf], np.nan).fillna(0)
+
+
+def truncated_prime_strings(first_prime, gaps, num_digits):
+    """The primes first_prime, first_prime + gaps[0], ... as their last num_digits digits, the way
+    str(prime)[-num_digits:] writes them in _primes.csv, computed modulo 10**num_digits from the gaps."""
+    offsets = np.concatenate(([0], np.cumsum(np.asarray(gaps, dtype=np.int64))))
+    modulus = 10 ** num_digits
+    if num_digits > 18:
+        return [str(first_prime + offset)[-num_digits:] for offset in offsets.tolist()]
+    low_digits = (first_prime % modulus + offsets) % modulus
+    strings = np.char.zfill(low_digits.astype(str), num_digits)
+    # Primes below 10**num_digits are written in full, without leading zeros
+    if first_prime < modulus:
+        short = offsets < modulus - first_prime
+        strings[short] = (first_prime + offsets[short]).astype(str)
+    return strings
+
+
+def read_primes_data(primes_filename):
+    """Read the per-prime rows of _primes.csv with compact dtypes: the truncated primes as strings, the second
+    differences as int32 and the second ratios as categorical strings.
+
+    Compressed CSV (.csv.gz, .csv.zst) and the columnar _primes.parquet and _primes.arrow outputs are read too.
+    """
+    dtypes = {'Prime': str, 'Second Difference': 'int32', 'Second Ratio': 'category'}
+    if primes_filename.endswith('.parquet'):
+        return pd.read_parquet(primes_filename).astype(dtypes)
+    if primes_filename.endswith('.arrow'):
+        return pd.read_feather(primes_filename).astype(dtypes)
+    return pd.read_csv(primes_filename, dtype=dtypes)
+
+
+def read_state_data(state_filename, num_digits):
+    """Build the same rows as read_primes_data straight from a compact state file, without going through CSV.
+    The decimal second ratios come straight from the integer ratios, with no string parsing."""
+    with load_state_file(state_filename) as state:
+        gaps = np.frombuffer(state.gaps, dtype=state.gaps.format).astype(np.int64)
+        first_prime = state.first_prime
+    sd = np.diff(gaps)
+    ss = gaps[:-1] + gaps[1:]
+    divisors = np.gcd(sd, ss)
+    numerators, denominators = sd // divisors, ss // divisors
+    if len(ss) and denominators.max() > MAX_RATIO_DENOMINATOR:
+        ratios = second_ratios_from_gaps(gaps.tolist())
+        numerators, denominators = np.array(ratios.numerators), np.array(ratios.denominators)
+
+    # One string per distinct ratio, as categories
+    keys = numerators * (1 << 32) + denominators
+    unique_keys, codes = np.unique(keys, return_inverse=True)
+    categories = [format_ratio(int(key) >> 32, int(key) & 0xFFFFFFFF) for key in unique_keys]
+
+    primes = truncated_prime_strings(first_prime, gaps, num_digits)
+    return pd.DataFrame({
+        'Prime': pd.Series(primes[1:len(sd) + 1], dtype=str),
+        'Second Difference': sd.astype('int32'),
+        'Second Ratio': pd.Categorical.from_codes(codes.reshape(-1), categories=categories),
+        'Second Ratio (Decimal)': numerators / denominators,
+    })
+
+
+def load_data(primes_filename, sd_freq_filename, sr_freq_filename, metadata_filename):
+    """Load data from the CSV files (or a compact _state.pdx in place of _primes.csv) and calculate ranks."""
+    # Read the metadata manually to handle large numbers
+    with open(metadata_filename) as f:
+        metadata = json.load(f)
+    if 'first_prime' in metadata:
+        metadata['first_prime'] = str(metadata['first_prime'])
+    if 'last_prime' in metadata:
+        metadata['last_prime'] = str(metadata['last_prime'])
+
+    # Read the per-prime data
+    if is_compact_state_file(primes_filename):
+        data = read_state_data(primes_filename, metadata.get('num_digits', 10))
+    else:
+        data = read_primes_data(primes_filename)
+
+    sd_freq = pd.read_csv(sd_freq_filename, dtype={'Second Difference': 'int32'}).set_index('Second Difference')
+    sr_freq = pd.read_csv(sr_freq_filename, dtype={'Second Ratio': str}, keep_default_na=False)
+
+    # Prepare data: each distinct ratio is parsed once, then spread over the rows by category code
+    ratios = data.pop('Second Ratio').astype('category')
+    codes = ratios.cat.codes.to_numpy()
+    if 'Second Ratio (Decimal)' not in data:
+        decimals = ratio_decimals(pd.Series(ratios.cat.categories)).to_numpy()
+        data['Second Ratio (Decimal)'] = np.where(codes >= 0, decimals[codes], 0.0)
+    data.insert(2, 'Second Ratio', ratios)
+    # The same codes with Fraction categories, also parsed once per distinct ratio, so each value is a Fraction as in
+    # earlier versions. Vectorized arithmetic and ordering need .astype(object) (or the decimal column)
+    data['Second Ratio (Fraction)'] = ratios.cat.rename_categories(
+        [Fraction(ratio) for ratio in ratios.cat.categories])
+
+    # Determine the maximum second difference in the data
+    max_sd = data['Second Difference'].abs().max()
+
+    # Assign ranks based on frequency
+    sd_freq['Rank'] = sd_freq['Count'].rank(ascending=False)
+    
+    # Assign ranks based on the count for second ratio (multiple SRs with the same count share the same rank)
+    sr_freq['Rank'] = sr_freq.groupby('Count')['Count'].ngroup(ascending=False) + 1
+
+    # Add ranks back to the data; SR ranks are looked up once per category
+    data['SD Rank'] = data['Second Difference'].map(sd_freq['Rank'])
+    category_ranks = pd.Series(sr_freq['Rank'].values, index=sr_freq['Second Ratio']).reindex(ratios.cat.categories)
+    data['SR Rank'] = pd.Series(category_ranks.to_numpy()[codes], index=data.index).where(codes >= 0)
+
+    return data, metadata, sd_freq, sr_freq, max_sd
+
+
+def create_prime_frame_for_animation(i, data, metadata, max_sd, sd_freq, sr_freq, fig, ax):
+    """Create a single frame for the animation."""
+    ax.clear()  # Clear the current frame
+    ax.set_xlim([-1.1, 1.1])  # Set the x-axis limits
+    ax.set_ylim([-1.1, 1.1])  # Set the y-axis limits
+    ax.set_aspect('equal')  # Change to 'equal' to ensure circles are not elliptical
+
+    # Get prime, SD, SR, and their ranks
+    prime = data['Prime'][i]
+    sd = data['Second Difference'][i]
+    sr_decimal = data['Second Ratio (Decimal)'][i]
+    sr_fraction = data['Second Ratio (Fraction)'][i]
+    sd_rank = data['SD Rank'][i]
+    sr_rank = data['SR Rank'][i]
+
+    # Get color and info for SD and SR
+    sd_color = plt.get_cmap('rainbow')(sd_rank / len(sd_freq))
+    sr_color = plt.get_cmap('rainbow')(sr_rank / len(sr_freq))
+
+    # Inner circle (particle)
+    particle = patches.Circle((float(sr_decimal), 0), radius=0.05, color=sr_color, linewidth=2)    
+    ax.add_artist(particle)
+
+    # Second difference (SD) circle
+    sd_radius = abs(sd) / max_sd
+    sd_circle = patches.Circle((0, 0), radius=sd_radius, edgecolor=sd_color, fill=False, linewidth=2)
+    ax.add_artist(sd_circle)
+
+    # Add SD and SR values to the plot
+    ax.text(0, sd_radius, f'{sd}', va='bottom', ha='center', fontsize=14, bbox=dict(boxstyle='round', facecolor=sd_color, alpha=0.5))
+    ax.text(0, -0.1, str(sr_fraction), va='top', ha='center', fontsize=14, color='black')
+
+    # Add SD, SR, and prime info to the title
+    last_prime = int(str(metadata['last_prime']))
+    last_num_bits = last_prime.bit_length()
+    start_prime_length = len(str(metadata['last_prime']))
+    prime_info = f'\nDataset Ending Bits: {last_num_bits} Dataset Ending # of Digits: {start_prime_length}\nLast digits of Prime: {prime}'
+    ax.set_title(f'{prime_info}\nSecond Difference: {sd} (Rank: {sd_rank})\nSecond Ratio: {str(sr_fraction)} (Rank: {sr_rank})')
+
+    return [particle, sd_circle]
+
+
+
+def dataset_title(metadata):
+    """The title lines describing the whole dataset, which are the same on every frame."""
+    last_prime = int(str(metadata['last_prime']))
+    last_num_bits = last_prime.bit_length()
+    start_prime_length = len(str(metadata['last_prime']))
+    return f'\nDataset Ending Bits: {last_num_bits} Dataset Ending # of Digits: {start_prime_length}'
+
+
+class PrimeFrameRenderer:
+    """Draws animation frames onto one figure whose artists are created once and then updated for each frame.
+
+    Gives the same picture as create_prime_frame_for_animation without clearing the axes and rebuilding every
+    artist per frame. render() returns the frame as raw RGB bytes of size width x height x 3.
+    """
+
+    def __init__(self, metadata, max_sd, num_sds, num_srs, figsize=(10, 10), dpi=None):
+        self.max_sd = max_sd
+        self.num_sds = num_sds
+        self.num_srs = num_srs
+        self.title = dataset_title(metadata)
+        self.colormap = plt.get_cmap('rainbow')
+
+        self.fig, self.ax = plt.subplots(figsize=figsize, dpi=dpi)
+        self.ax.set_xlim([-1.1, 1.1])
+        self.ax.set_ylim([-1.1, 1.1])
+        self.ax.set_aspect('equal')
+        self.particle = patches.Circle((0, 0), radius=0.05, linewidth=2)
+        self.sd_circle = patches.Circle((0, 0), radius=0, fill=False, linewidth=2)
+        self.ax.add_artist(self.particle)
+        self.ax.add_artist(self.sd_circle)
+        self.sd_text = self.ax.text(0, 0, '', va='bottom', ha='center', fontsize=14,
+                                    bbox=dict(boxstyle='round', alpha=0.5))
+        self.sr_text = self.ax.text(0, -0.1, '', va='top', ha='center', fontsize=14, color='black')
+        self.fig.canvas.draw()
+        self.width, self.height = self.fig.canvas.get_width_height(physical=True)
+
+    def draw(self, prime, sd, sr_decimal, sr_fraction, sd_rank, sr_rank):
+        """Update the artists for one frame."""
+        sd_color = self.colormap(sd_rank / self.num_sds)
+        sr_color = self.colormap(sr_rank / self.num_srs)
+        sd_radius = abs(sd) / self.max_sd
+
+        self.particle.set_center((float(sr_decimal), 0))
+        self.particle.set_color(sr_color)
+        self.sd_circle.set_radius(sd_radius)
+        self.sd_circle.set_edgecolor(sd_color)
+        self.sd_text.set_position((0, sd_radius))
+        self.sd_text.set_text(f'{sd}')
+        self.sd_text.get_bbox_patch().set_facecolor(sd_color)
+        self.sr_text.set_text(str(sr_fraction))
+        prime_info = f'{self.title}\nLast digits of Prime: {prime}'
+        self.ax.set_title(f'{prime_info}\nSecond Difference: {sd} (Rank: {sd_rank})\nSecond Ratio: {str(sr_fraction)} (Rank: {sr_rank})')
+
+    def render(self, frame):
+        """Draw one frame, given as the tuple of arguments to draw(), and return its RGB bytes."""
+        self.draw(*frame)
+        self.fig.canvas.draw()
+        rgba = np.asarray(self.fig.canvas.buffer_rgba())
+        return rgba[:, :, :3].tobytes()
+
+
+# The renderer of a frame rendering worker process, set up once by _init_frame_renderer.
+_frame_renderer = None
+
+
+def _init_frame_renderer(*renderer_arguments):
+    global _frame_renderer
+    _frame_renderer = PrimeFrameRenderer(*renderer_arguments)
+
+
+def _render_frame(frame):
+    return _frame_renderer.render(frame)
+
+
+def animation_frames(data, frame_step=1, max_frames=None):
+    """The per-frame tuples for PrimeFrameRenderer.draw, keeping every frame_step-th row of data (or evenly spaced
+    rows, at most max_frames of them, for very large datasets)."""
+    if max_frames:
+        frame_step = max(frame_step, -(-len(data) // max_frames))
+    columns = ['Prime', 'Second Difference', 'Second Ratio (Decimal)', 'Second Ratio (Fraction)', 'SD Rank', 'SR Rank']
+    rows = data[columns].iloc[::frame_step]
+    return list(rows.itertuples(index=False, name=None))
+
+
+def write_frames_with_ffmpeg(frames, width, height, fps, output_filename):
+    """Pipe raw RGB frames, in order, into a single ffmpeg process encoding output_filename."""
+    command = [
+        plt.rcParams['animation.ffmpeg_path'], '-y', '-loglevel', 'error',
+        '-f', 'rawvideo', '-vcodec', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}', '-r', str(fps),
+        '-i', '-',
+        '-vcodec', plt.rcParams['animation.codec'], '-pix_fmt', 'yuv420p',
+        '-vf', 'scale=trunc(iw/2)*2:trunc(ih/2)*2', output_filename,
+    ]
+    process = subprocess.Popen(command, stdin=subprocess.PIPE)
+    try:
+        for frame in frames:
+            process.stdin.write(frame)
+    finally:
+        process.stdin.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed while writing {output_filename}")
+
+
+def run_config_animation(directory_path, num_workers=None, frame_step=1, max_frames=None, fps=5):
+    """Generate the animation from files in the specified directory."""
+    import os
+    import json
+
+    # Get the prefix from the directory name
+    prefix = os.path.basename(directory_path).split("_")[0]
+
+    # Check if all necessary files exist. The CSV files may be compressed, the primes may have been written as
+    # Parquet or Arrow, and the compact state file can stand in for the primes.
+    primes_filename = find_output_file(directory_path, f"{prefix}_primes",
+                                       CSV_OUTPUT_SUFFIXES + ('.parquet', '.arrow')) \
+        or find_output_file(directory_path, f"{prefix}_state", ('.pdx',)) or f"{prefix}_primes.csv"
+    sd_filename = find_output_file(directory_path, f"{prefix}_sd") or f"{prefix}_sd.csv"
+    sr_filename = find_output_file(directory_path, f"{prefix}_sr") or f"{prefix}_sr.csv"
+    necessary_files = [
+        primes_filename,
+        sd_filename,
+        sr_filename,
+        "metadata.json",
+    ]
+    for filename in necessary_files:
+        if not os.path.isfile(os.path.join(directory_path, filename)):
+            raise FileNotFoundError(f"Missing necessary file: {filename}")
+
+    # Load the metadata
+    with open(os.path.join(directory_path, "metadata.json")) as f:
+        metadata = json.load(f)
+
+    # Get the output filename
+    output_filename = os.path.join(directory_path, f"{prefix}_animation.mp4")
+
+    # Run the animation
+    create_prime_animation(
+        os.path.join(directory_path, primes_filename),
+        os.path.join(directory_path, sd_filename),
+        os.path.join(directory_path, sr_filename),
+        os.path.join(directory_path, "metadata.json"),
+        output_filename,
+        num_workers=num_workers,
+        frame_step=frame_step,
+        max_frames=max_frames,
+        fps=fps,
+    )
+
+    print(f"Animation saved to: {output_filename}")
+
+
+def create_prime_animation(primes_filename, sd_freq_filename, sr_freq_filename, metadata_filename, output_filename,
+                           num_workers=None, frame_step=1, max_frames=None, fps=5):
+    """Create an animation of prime numbers, showing the second difference and second ratio.
+
+    Frames are rendered by a PrimeFrameRenderer, in a pool of num_workers processes when num_workers > 1, and piped
+    in order to one ffmpeg process. frame_step and max_frames subsample the rows of very large datasets.
+    Returns the output filename.
+    """
+    # Load the data
+    print("Loading data...")
+    data, metadata, sd_freq, sr_freq, max_sd = load_data(primes_filename, sd_freq_filename, sr_freq_filename, metadata_filename)
+    frames = animation_frames(data, frame_step, max_frames)
+
+    # Set up the figure
+    print("Setting up the figure...")
+    renderer_arguments = (metadata, max_sd, len(sd_freq), len(sr_freq))
+    renderer = PrimeFrameRenderer(*renderer_arguments)
+
+    print(f"Rendering {len(frames)} frames to {output_filename}...")
+    with warnings.catch_warnings():  # Suppress warnings
+        warnings.simplefilter('ignore')
+        with tqdm(total=len(frames), ncols=70) as pbar:
+            def rendered(frame_bytes):
+                for frame in frame_bytes:
+                    pbar.update()
+                    yield frame
+
+            if num_workers and num_workers > 1:
+                plt.close(renderer.fig)
+                with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_frame_renderer,
+                                         initargs=renderer_arguments) as executor:
+                    chunksize = max(1, min(16, len(frames) // (4 * num_workers)))
+                    frame_bytes = executor.map(_render_frame, frames, chunksize=chunksize)
+                    write_frames_with_ffmpeg(rendered(frame_bytes), renderer.width, renderer.height, fps,
+                                             output_filename)
+            else:
+                write_frames_with_ffmpeg(rendered(map(renderer.render, frames)), renderer.width, renderer.height,
+                                         fps, output_filename)
+                plt.close(renderer.fig)
+
+    print("Animation created successfully!")
+    return output_filename